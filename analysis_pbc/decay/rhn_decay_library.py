@@ -1,16 +1,23 @@
 from __future__ import annotations
 
+import os
 import re
 import warnings
+from collections import OrderedDict
 from dataclasses import dataclass
-from functools import lru_cache
+from functools import lru_cache, wraps
 from pathlib import Path
-from typing import Iterable, List, Tuple
+from typing import Callable, Iterable, List, Tuple
 
 import numpy as np
 
 REPO_ROOT = Path(__file__).resolve().parents[2]
 EXTERNAL_ROOT = REPO_ROOT / "analysis_pbc" / "decay" / "external"
+# Optional overlay with locally generated decay files (same layout/format as the
+# external MATHUSLA repositories). Entries found here take precedence over the
+# external files at the same mass point. The directory is generated + gitignored;
+# when it is absent or empty the library behaves exactly as external-only.
+GENERATED_ROOT = REPO_ROOT / "analysis_pbc" / "decay" / "generated"
 
 FLAVOUR_CONFIG = {
     "electron": {
@@ -76,13 +83,27 @@ class DecayFileEntry:
     path: Path
     mass_GeV: float
     category: str
+    # Provenance of the file; defaults keep externally constructed entries valid.
+    source: str = "external"
+    source_priority: int = 0
 
 
-def _decay_dir(flavour: str) -> Path:
+_SOURCE_PRIORITIES = {
+    "external": 0,
+    "generated": 1,
+}
+
+
+def _decay_dirs(flavour: str) -> List[Tuple[str, Path]]:
+    """Return (source, directory) pairs to scan, overlay first."""
     config = FLAVOUR_CONFIG.get(flavour)
     if not config:
         raise ValueError(f"Unknown flavour '{flavour}' for decay library.")
-    return EXTERNAL_ROOT / config["repo"] / config["decay_dir"]
+    subdir = Path(config["repo"]) / config["decay_dir"]
+    return [
+        ("generated", GENERATED_ROOT / subdir),
+        ("external", EXTERNAL_ROOT / subdir),
+    ]
 
 
 def _parse_mass_from_name(path: Path) -> float | None:
@@ -100,22 +121,69 @@ def _categorize_name(path: Path) -> str:
     return "unknown"
 
 
+@dataclass(frozen=True)
+class DecayIndex:
+    """Decay-file entries for one flavour with precomputed selection buckets."""
+    all: Tuple[DecayFileEntry, ...]
+    by_category: "dict[str, Tuple[DecayFileEntry, ...]]"
+    by_source: "dict[str, Tuple[DecayFileEntry, ...]]"
+    analytical: Tuple[DecayFileEntry, ...]
+    allowed: Tuple[DecayFileEntry, ...]  # priority categories, excluding analytical
+
+
 @lru_cache(maxsize=6)
+def decay_file_index(flavour: str) -> DecayIndex:
+    entries = _scan_decay_files(flavour)
+    by_category: dict[str, list[DecayFileEntry]] = {}
+    by_source: dict[str, list[DecayFileEntry]] = {}
+    for entry in entries:
+        by_category.setdefault(entry.category, []).append(entry)
+        by_source.setdefault(entry.source, []).append(entry)
+    priorities = DECAY_PRIORITIES.get(flavour, ())
+    allowed = tuple(
+        e for e in entries
+        if e.category in priorities and e.category != "analytical2and3bodydecays"
+    )
+    return DecayIndex(
+        all=tuple(entries),
+        by_category={k: tuple(v) for k, v in by_category.items()},
+        by_source={k: tuple(v) for k, v in by_source.items()},
+        analytical=tuple(by_category.get("analytical2and3bodydecays", ())),
+        allowed=allowed,
+    )
+
+
 def list_decay_files(flavour: str) -> List[DecayFileEntry]:
-    decay_dir = _decay_dir(flavour)
-    if not decay_dir.exists():
+    return list(decay_file_index(flavour).all)
+
+
+def _scan_decay_files(flavour: str) -> List[DecayFileEntry]:
+    external_dir = dict(_decay_dirs(flavour))["external"]
+    if not external_dir.exists():
         raise FileNotFoundError(
-            f"Decay directory not found: {decay_dir}. "
+            f"Decay directory not found: {external_dir}. "
             "Make sure the MATHUSLA_LLPfiles RHN repositories are present."
         )
     entries: List[DecayFileEntry] = []
-    for path in decay_dir.glob("*.txt"):
-        mass = _parse_mass_from_name(path)
-        if mass is None:
+    for source, decay_dir in _decay_dirs(flavour):
+        if not decay_dir.exists():
             continue
-        entries.append(DecayFileEntry(path=path, mass_GeV=mass, category=_categorize_name(path)))
+        priority = _SOURCE_PRIORITIES[source]
+        for path in decay_dir.glob("*.txt"):
+            mass = _parse_mass_from_name(path)
+            if mass is None:
+                continue
+            entries.append(
+                DecayFileEntry(
+                    path=path,
+                    mass_GeV=mass,
+                    category=_categorize_name(path),
+                    source=source,
+                    source_priority=priority,
+                )
+            )
     if not entries:
-        raise FileNotFoundError(f"No decay files found in {decay_dir}.")
+        raise FileNotFoundError(f"No decay files found in {external_dir}.")
     return entries
 
 
@@ -123,7 +191,8 @@ def _nearest_entry(entries: Iterable[DecayFileEntry], mass_GeV: float) -> DecayF
     entries = list(entries)
     if not entries:
         return None
-    return min(entries, key=lambda e: abs(e.mass_GeV - mass_GeV))
+    # At equal mass distance, prefer the higher-priority (generated) source.
+    return min(entries, key=lambda e: (abs(e.mass_GeV - mass_GeV), -e.source_priority))
 
 
 def _warn_if_large_mismatch(chosen: DecayFileEntry, mass_GeV: float, max_delta: float) -> None:
@@ -138,68 +207,134 @@ def _warn_if_large_mismatch(chosen: DecayFileEntry, mass_GeV: float, max_delta:
 
 
 def select_decay_file(flavour: str, mass_GeV: float) -> DecayFileEntry:
-    entries = list_decay_files(flavour)
+    index = decay_file_index(flavour)
     low_mass_threshold = FLAVOUR_CONFIG[flavour]["low_mass_threshold"]
     priorities = DECAY_PRIORITIES.get(flavour)
     if not priorities:
-        chosen = _nearest_entry(entries, mass_GeV)
+        chosen = _nearest_entry(index.all, mass_GeV)
         if chosen is None:
             raise FileNotFoundError(f"No decay files available for flavour '{flavour}'.")
         _warn_if_large_mismatch(chosen, mass_GeV, MAX_DECAY_FILE_DELTA_GEV)
         return chosen
 
     if mass_GeV <= low_mass_threshold:
-        analytical = [e for e in entries if e.category == "analytical2and3bodydecays"]
-        chosen = _nearest_entry(analytical, mass_GeV)
+        chosen = _nearest_entry(index.analytical, mass_GeV)
         if chosen is None:
-            chosen = _nearest_entry(entries, mass_GeV)
+            chosen = _nearest_entry(index.all, mass_GeV)
         if chosen is None:
             raise FileNotFoundError(f"No decay files available for flavour '{flavour}'.")
         _warn_if_large_mismatch(chosen, mass_GeV, MAX_DECAY_FILE_DELTA_GEV)
         return chosen
 
     # Above threshold: choose nearest file among allowed physics categories
-    allowed = [e for e in entries if e.category in priorities and e.category != "analytical2and3bodydecays"]
-    chosen = _nearest_entry(allowed, mass_GeV)
+    chosen = _nearest_entry(index.allowed, mass_GeV)
     if chosen is None:
-        chosen = _nearest_entry(entries, mass_GeV)
+        chosen = _nearest_entry(index.all, mass_GeV)
     if chosen is None:
         raise FileNotFoundError(f"No decay files available for flavour '{flavour}'.")
     _warn_if_large_mismatch(chosen, mass_GeV, MAX_DECAY_FILE_DELTA_GEV)
     return chosen
 
 
-def _parse_decay_event_block(lines: List[str]) -> List[Tuple[float, float, float, float, float, int]]:
-    daughters: List[Tuple[float, float, float, float, float, int]] = []
+def _parse_decay_event_block(lines: List[str]) -> np.ndarray:
+    """
+    Parse one event block into a (n_daughters, 6) float64 array with columns
+    (E, px, py, pz, mass, pid). The pid column is stored as float (exact for
+    any PDG code); consumers needing ints can cast lazily.
+    """
     if not lines:
-        return daughters
+        return np.empty((0, 6), dtype=np.float64)
     # First line is LLP 4-vector, ignore.
+    out = np.empty((len(lines) - 1, 6), dtype=np.float64)
+    k = 0
     for line in lines[1:]:
         parts = [p.strip() for p in line.split(",") if p.strip()]
         if len(parts) < 6:
             continue
         try:
-            E, px, py, pz, mass, pid = parts[:6]
-            daughters.append((float(E), float(px), float(py), float(pz), float(mass), int(pid)))
+            out[k] = [float(p) for p in parts[:6]]
         except ValueError:
             continue
-    return daughters
-
-
-@lru_cache(maxsize=32)
-def load_decay_events(path: Path) -> List[List[Tuple[float, float, float, float, float, int]]]:
+        k += 1
+    return out[:k]
+
+
+# Cache budget for parsed decay files, in MB. A single inclusive decay file can
+# be ~100x the size of a small analytical one, so the cache is bounded by
+# approximate byte size rather than entry count.
+_DECAY_CACHE_MB_DEFAULT = 256
+
+
+def _decay_cache_budget_bytes() -> int:
+    try:
+        budget_mb = float(os.environ.get("HNL_DECAY_CACHE_MB", _DECAY_CACHE_MB_DEFAULT))
+    except ValueError:
+        budget_mb = _DECAY_CACHE_MB_DEFAULT
+    return int(budget_mb * 1024 * 1024)
+
+
+def _sized_cache(size_of: Callable) -> Callable:
+    """
+    LRU cache bounded by cumulative value size (bytes) instead of entry count.
+
+    ``size_of(value)`` must return the approximate byte size of a cached value.
+    The byte budget is read from HNL_DECAY_CACHE_MB on each insert so tests and
+    long-running drivers can adjust it without reimporting.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        cache: OrderedDict = OrderedDict()
+        sizes: dict = {}
+        total = 0
+
+        @wraps(func)
+        def wrapper(*args):
+            nonlocal total
+            if args in cache:
+                cache.move_to_end(args)
+                return cache[args]
+            value = func(*args)
+            nbytes = int(size_of(value))
+            budget = _decay_cache_budget_bytes()
+            while cache and total + nbytes > budget:
+                old_key, _ = cache.popitem(last=False)
+                total -= sizes.pop(old_key, 0)
+            if nbytes <= budget:
+                cache[args] = value
+                sizes[args] = nbytes
+                total += nbytes
+            return value
+
+        def cache_clear() -> None:
+            nonlocal total
+            cache.clear()
+            sizes.clear()
+            total = 0
+
+        wrapper.cache_clear = cache_clear
+        return wrapper
+
+    return decorator
+
+
+def _events_nbytes(events: List[np.ndarray]) -> int:
+    return sum(e.nbytes for e in events)
+
+
+@_sized_cache(size_of=_events_nbytes)
+def load_decay_events(path: Path) -> List[np.ndarray]:
     if not path.exists():
         raise FileNotFoundError(f"Decay file not found: {path}")
     text = path.read_text()
     lines = [line.strip() for line in text.splitlines()]
 
-    events: List[List[Tuple[float, float, float, float, float, int]]] = []
+    events: List[np.ndarray] = []
     current: List[str] = []
     for line in lines:
         if not line:
             if current:
                 event = _parse_decay_event_block(current)
-                if event:
+                if len(event):
                     events.append(event)
                 current = []
             continue
@@ -208,7 +343,7 @@ def load_decay_events(path: Path) -> List[List[Tuple[float, float, float, float,
         current.append(line)
     if current:
         event = _parse_decay_event_block(current)
-        if event:
+        if len(event):
             events.append(event)
     if not events:
         raise ValueError(f"No decay events parsed from {path}")
@@ -217,8 +352,8 @@ def load_decay_events(path: Path) -> List[List[Tuple[float, float, float, float,
 
 def pick_decay_events(
     rng: np.random.Generator,
-    events: List[List[Tuple[float, float, float, float, float, int]]],
+    events: List[np.ndarray],
     n: int,
-) -> List[List[Tuple[float, float, float, float, float, int]]]:
+) -> List[np.ndarray]:
     indices = rng.integers(0, len(events), size=n)
     return [events[i] for i in indices]
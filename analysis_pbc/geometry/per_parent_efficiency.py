@@ -1,4 +1,11 @@
+import hashlib
+import math
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
 
 import numpy as np
 import pandas as pd
@@ -13,6 +20,167 @@ except Exception:  # pragma: no cover
     class RTreeError(Exception):
         pass
 
+# Optional: Numba JIT for the per-ray hit reduction. Without it the pure
+# Python implementation below is used unchanged.
+try:
+    from numba import njit, prange
+except Exception:  # pragma: no cover - optional dependency
+    njit = None
+    prange = range
+
+# Optional: CuPy for running the analytic ray-cylinder kernel on a GPU.
+try:
+    import cupy
+except Exception:  # pragma: no cover - optional dependency
+    cupy = None
+
+# Optional: numexpr fuses the transcendental-heavy direction computation into
+# one multi-threaded pass without large intermediates.
+try:
+    import numexpr
+except Exception:  # pragma: no cover - optional dependency
+    numexpr = None
+
+
+def _attach_embree_intersector(mesh: "trimesh.Trimesh") -> bool:
+    """
+    Swap the mesh's ray intersector for the Embree-backed one when available.
+
+    Embree (via the optional embreex/pyembree package) traverses a SAH BVH with
+    SIMD ray packets and is orders of magnitude faster than the default NumPy
+    triangle intersector. Falls back silently to the default backend.
+    """
+    try:
+        from trimesh.ray.ray_pyembree import RayMeshIntersector
+    except BaseException:  # pragma: no cover - optional dependency
+        return False
+    try:
+        mesh.ray = RayMeshIntersector(mesh)
+    except BaseException:  # pragma: no cover - embree init failure
+        return False
+    return True
+
+
+def _uses_embree(mesh: "trimesh.Trimesh") -> bool:
+    return "pyembree" in type(mesh.ray).__module__
+
+
+# Ray batch sizes for intersects_location. Embree comfortably handles very
+# large batches in one call; the rtree backend is kept at a modest size so the
+# RTreeError fallback stays cheap.
+_RAY_BATCH_SIZE_EMBREE = 500_000
+_RAY_BATCH_SIZE_DEFAULT = 10_000
+
+
+def _reduce_hits_scan(
+    t: np.ndarray,
+    index_ray: np.ndarray,
+    group_starts: np.ndarray,
+    idx_chunk: np.ndarray,
+    hits_tube: np.ndarray,
+    entry_distance: np.ndarray,
+    path_length: np.ndarray,
+) -> None:
+    """
+    Accumulate entry distance and in-tube path length per ray.
+
+    ``t`` and ``index_ray`` must be lexsorted by (ray, t), with
+    ``group_starts`` delimiting the per-ray hit groups (one extra trailing
+    entry equal to ``len(t)``). Consecutive hits of a ray are paired
+    (enter, exit); rays with fewer than two hits are skipped. Results are
+    scattered into the preallocated output arrays at the dataframe rows
+    given by ``idx_chunk``. Groups are disjoint and each writes a distinct
+    output row, so under Numba the loop runs as ``prange`` without races.
+    """
+    for g in prange(len(group_starts) - 1):
+        start = group_starts[g]
+        end = group_starts[g + 1]
+        count = end - start
+        if count >= 2:
+            n_pairs = count // 2
+            path_val = 0.0
+            for k in range(n_pairs):
+                path_val += t[start + 2 * k + 1] - t[start + 2 * k]
+            df_idx = idx_chunk[index_ray[start]]
+            hits_tube[df_idx] = True
+            entry_distance[df_idx] = t[start]
+            path_length[df_idx] = path_val
+
+
+def _reduce_hits_numpy(
+    t: np.ndarray,
+    index_ray: np.ndarray,
+    idx_chunk: np.ndarray,
+    hits_tube: np.ndarray,
+    entry_distance: np.ndarray,
+    path_length: np.ndarray,
+) -> None:
+    """
+    Vectorized equivalent of _reduce_hits_scan: counts + offsets encode the
+    variable-length per-ray hit groups, the exit-minus-entry pairing becomes
+    a signed bincount, and results land in one scatter per output array.
+    Used when Numba is unavailable so no Python-level loop over rays remains.
+    """
+    n_rays = len(idx_chunk)
+    counts = np.bincount(index_ray, minlength=n_rays)
+    offsets = np.cumsum(counts) - counts
+
+    # Position of each hit inside its ray's group; only the first
+    # 2*(count//2) hits of a group form complete (enter, exit) pairs.
+    pos = np.arange(len(t)) - np.repeat(offsets, counts)
+    paired = pos < 2 * (np.repeat(counts, counts) // 2)
+    sign = np.where(pos % 2 == 0, -1.0, 1.0)
+    path_per_ray = np.bincount(
+        index_ray[paired], weights=(sign * t)[paired], minlength=n_rays
+    )
+
+    sel = counts >= 2
+    rows = idx_chunk[sel]
+    hits_tube[rows] = True
+    entry_distance[rows] = t[offsets[sel]]
+    path_length[rows] = path_per_ray[sel]
+
+
+if njit is not None:
+    _reduce_hits_scan_jit = njit(parallel=True, cache=True)(_reduce_hits_scan)
+
+    def _reduce_hits(t, index_ray, idx_chunk, hits_tube, entry_distance, path_length):
+        if len(index_ray) == 0:
+            return
+        change = np.flatnonzero(index_ray[1:] != index_ray[:-1]) + 1
+        group_starts = np.concatenate(([0], change, [len(index_ray)]))
+        _reduce_hits_scan_jit(
+            t, index_ray, group_starts, idx_chunk,
+            hits_tube, entry_distance, path_length,
+        )
+else:
+    _reduce_hits = _reduce_hits_numpy
+
+
+def _aabb_ray_mask(origin: np.ndarray, directions: np.ndarray, bounds: np.ndarray) -> np.ndarray:
+    """
+    Conservative slab test: True for rays from ``origin`` whose forward
+    half-line can intersect the axis-aligned bounding box ``bounds``
+    ((min_xyz, max_xyz)). Pure NumPy on the full (N, 3) direction array;
+    never produces false negatives, so it is safe as a pre-filter in front
+    of the exact mesh intersection.
+    """
+    bmin, bmax = bounds
+    with np.errstate(divide="ignore", invalid="ignore"):
+        inv = 1.0 / directions
+        t1 = (bmin - origin) * inv
+        t2 = (bmax - origin) * inv
+    lo = np.minimum(t1, t2)
+    hi = np.maximum(t1, t2)
+    # Axis-parallel rays: inside that slab -> (-inf, inf); outside -> empty.
+    parallel = directions == 0.0
+    inside = (origin >= bmin) & (origin <= bmax)
+    lo = np.where(parallel, np.where(inside, -np.inf, np.inf), lo)
+    hi = np.where(parallel, np.where(inside, np.inf, -np.inf), hi)
+    tmin = np.maximum(lo.max(axis=1), 0.0)
+    tmax = hi.min(axis=1)
+    return tmax >= tmin
+
 
 def eta_phi_to_direction(eta: float, phi: float) -> np.ndarray:
     """
@@ -25,40 +193,80 @@ def eta_phi_to_direction(eta: float, phi: float) -> np.ndarray:
     Returns:
         Normalized 3D direction vector [dx, dy, dz]
     """
-    # Convert eta to polar angle theta
-    theta = 2.0 * np.arctan(np.exp(-eta))
+    # Convert eta to polar angle theta. Scalar math.* calls avoid the NumPy
+    # per-call dispatch overhead, which dominates at this size.
+    theta = 2.0 * math.atan(math.exp(-eta))
 
     # Convert to Cartesian direction
-    dx = np.sin(theta) * np.cos(phi)
-    dy = np.sin(theta) * np.sin(phi)
-    dz = np.cos(theta)
+    sin_theta = math.sin(theta)
+    dx = sin_theta * math.cos(phi)
+    dy = sin_theta * math.sin(phi)
+    dz = math.cos(theta)
 
     return np.array([dx, dy, dz], dtype=float)
 
 
-def eta_phi_to_directions(eta: np.ndarray, phi: np.ndarray) -> np.ndarray:
+# Inputs longer than this bypass the direction memo to keep cached byte
+# copies bounded (8 entries x ~160 MB would otherwise be possible).
+_DIRECTIONS_CACHE_MAX_ROWS = 10_000_000
+
+
+def eta_phi_to_directions(eta: np.ndarray, phi: np.ndarray, dtype=float) -> np.ndarray:
     """
     Vectorized version of eta_phi_to_direction.
 
+    Repeated calls with identical inputs (e.g. reprocessing the same CSV in
+    one session) are served from a small LRU memo; the returned array is
+    marked read-only in that case, so copy before mutating in place.
+
     Args:
         eta: array of pseudorapidity values
         phi: array of azimuthal angles (radians)
+        dtype: dtype of the returned directions. The computation runs in
+            float64 and is rounded once at the end, so float32 output is
+            bit-identical to casting the float64 result.
 
     Returns:
         Array of shape (N, 3) with unit direction vectors.
     """
     eta = np.asarray(eta, dtype=float)
     phi = np.asarray(phi, dtype=float)
+    dtype = np.dtype(dtype)
 
-    theta = 2.0 * np.arctan(np.exp(-eta))
-    dx = np.sin(theta) * np.cos(phi)
-    dy = np.sin(theta) * np.sin(phi)
-    dz = np.cos(theta)
-
-    directions = np.stack([dx, dy, dz], axis=1)
-    norms = np.linalg.norm(directions, axis=1)
-    norms = np.where(norms > 0.0, norms, np.nan)
-    return directions / norms[:, None]
+    if 0 < len(eta) <= _DIRECTIONS_CACHE_MAX_ROWS and eta.shape == phi.shape:
+        return _eta_phi_directions_cached(
+            eta.tobytes(), phi.tobytes(), len(eta), dtype.str
+        )
+    return _eta_phi_directions_impl(eta, phi, dtype)
+
+
+@lru_cache(maxsize=8)
+def _eta_phi_directions_cached(
+    eta_bytes: bytes, phi_bytes: bytes, n: int, dtype_str: str
+) -> np.ndarray:
+    eta = np.frombuffer(eta_bytes, dtype=float, count=n)
+    phi = np.frombuffer(phi_bytes, dtype=float, count=n)
+    directions = _eta_phi_directions_impl(eta, phi, np.dtype(dtype_str))
+    directions.setflags(write=False)
+    return directions
+
+
+def _eta_phi_directions_impl(eta: np.ndarray, phi: np.ndarray, dtype=float) -> np.ndarray:
+    # For theta = 2*atan(exp(-eta)): sin(theta) = 1/cosh(eta) and
+    # cos(theta) = tanh(eta). The result is a unit vector by construction,
+    # so no post-normalization is needed; non-finite inputs propagate to
+    # non-finite outputs for the caller's validity mask.
+    directions = np.empty((len(eta), 3), dtype=float)
+    if numexpr is not None and len(eta) >= 10_000:
+        numexpr.evaluate("cos(phi) / cosh(eta)", out=directions[:, 0])
+        numexpr.evaluate("sin(phi) / cosh(eta)", out=directions[:, 1])
+        numexpr.evaluate("tanh(eta)", out=directions[:, 2])
+        return directions.astype(dtype, copy=False)
+    sin_theta = 1.0 / np.cosh(eta)
+    np.multiply(sin_theta, np.cos(phi), out=directions[:, 0])
+    np.multiply(sin_theta, np.sin(phi), out=directions[:, 1])
+    np.tanh(eta, out=directions[:, 2])
+    return directions.astype(dtype, copy=False)
 
 
 def create_tube_mesh(path_points: np.ndarray,
@@ -74,91 +282,150 @@ def create_tube_mesh(path_points: np.ndarray,
 
     Returns:
         vertices: (Nv, 3) array of vertex positions
-        faces:    (Nf, 3) array of triangular faces (indices into vertices)
+        faces:    (Nf, 3) array of triangular faces (indices into vertices).
+            Windings are outward-facing (positive enclosed volume), an
+            invariant callers rely on to skip any volume check / invert.
     """
     path_points = np.asarray(path_points, dtype=float)
-    vertices: list[np.ndarray] = []
-    faces: list[list[int]] = []
 
     n_points = len(path_points)
     if n_points < 2:
         raise ValueError("Need at least two path points to build a tube.")
 
-    for i in range(n_points):
-        if i == 0:
-            tangent = path_points[1] - path_points[0]
-        elif i == n_points - 1:
-            tangent = path_points[i] - path_points[i - 1]
-        else:
-            tangent = path_points[i + 1] - path_points[i - 1]
+    # Tangents: central differences in the interior, one-sided at the ends.
+    tangents = np.empty_like(path_points)
+    tangents[0] = path_points[1] - path_points[0]
+    tangents[-1] = path_points[-1] - path_points[-2]
+    if n_points > 2:
+        tangents[1:-1] = path_points[2:] - path_points[:-2]
+    tangents /= np.linalg.norm(tangents, axis=1, keepdims=True)
+
+    # Choose an "up" vector not parallel to each tangent
+    up = np.where(
+        np.abs(tangents[:, 2:3]) < 0.9,
+        np.array([0.0, 0.0, 1.0]),
+        np.array([1.0, 0.0, 0.0]),
+    )
 
-        tangent = tangent / np.linalg.norm(tangent)
+    right = np.cross(tangents, up)
+    right /= np.linalg.norm(right, axis=1, keepdims=True)
+    up = np.cross(right, tangents)
+    up /= np.linalg.norm(up, axis=1, keepdims=True)
 
-        # Choose an "up" vector not parallel to tangent
-        if abs(tangent[2]) < 0.9:
-            up = np.array([0.0, 0.0, 1.0])
-        else:
-            up = np.array([1.0, 0.0, 0.0])
-
-        right = np.cross(tangent, up)
-        right = right / np.linalg.norm(right)
-        up = np.cross(right, tangent)
-        up = up / np.linalg.norm(up)
-
-        # Build the ring of vertices at this path point
-        for j in range(n_segments):
-            angle = 2.0 * np.pi * j / n_segments
-            offset = radius * (np.cos(angle) * right + np.sin(angle) * up)
-            vertex = path_points[i] + offset
-            vertices.append(vertex)
-
-        # Connect this ring to the previous ring
-        if i > 0:
-            for j in range(n_segments):
-                v1 = (i - 1) * n_segments + j
-                v2 = (i - 1) * n_segments + (j + 1) % n_segments
-                v3 = i * n_segments + (j + 1) % n_segments
-                v4 = i * n_segments + j
-
-                # Two triangles per quad
-                faces.append([v1, v4, v3])
-                faces.append([v1, v3, v2])
+    # All rings in one broadcast: (n_points, n_segments, 3)
+    angles = 2.0 * np.pi * np.arange(n_segments) / n_segments
+    offsets = radius * (
+        np.cos(angles)[None, :, None] * right[:, None, :]
+        + np.sin(angles)[None, :, None] * up[:, None, :]
+    )
+    rings = path_points[:, None, :] + offsets
+    vertices = np.concatenate(
+        [rings.reshape(-1, 3), path_points[0][None, :], path_points[-1][None, :]],
+        axis=0,
+    )
+
+    # Side faces: two triangles per quad between consecutive rings.
+    j = np.arange(n_segments)
+    jn = (j + 1) % n_segments
+    ring_start = n_segments * np.arange(n_points - 1)[:, None]
+    v1 = ring_start + j
+    v2 = ring_start + jn
+    v3 = ring_start + n_segments + jn
+    v4 = ring_start + n_segments + j
+    side_faces = np.concatenate(
+        [
+            np.stack([v1, v4, v3], axis=2).reshape(-1, 3),
+            np.stack([v1, v3, v2], axis=2).reshape(-1, 3),
+        ],
+        axis=1,
+    ).reshape(-1, 3)
 
     # Cap the ends
-    center_start = len(vertices)
-    vertices.append(path_points[0])
-    for j in range(n_segments):
-        v1 = j
-        v2 = (j + 1) % n_segments
-        faces.append([center_start, v1, v2])
+    center_start = n_points * n_segments
+    center_end = center_start + 1
+    start_caps = np.column_stack([np.full(n_segments, center_start), j, jn])
+    last_ring = (n_points - 1) * n_segments
+    end_caps = np.column_stack([np.full(n_segments, center_end), last_ring + jn, last_ring + j])
+
+    faces = np.concatenate([side_faces, start_caps, end_caps], axis=0)
+    return vertices, faces.astype(int)
+
 
-    center_end = len(vertices)
-    vertices.append(path_points[-1])
-    last_ring_start = (n_points - 1) * n_segments
-    for j in range(n_segments):
-        v1 = last_ring_start + j
-        v2 = last_ring_start + (j + 1) % n_segments
-        faces.append([center_end, v2, v1])
+# Physical tube radius is ~1.4 m. The envelope margin avoids edge-effects from
+# polygonization / discretization in this fast-acceptance model and gives some
+# robustness against small geometry/alignment uncertainties.
+GALLERY_TUBE_RADIUS_M = 1.4
+GALLERY_TUBE_ENVELOPE_MARGIN = 1.1
+GALLERY_TUBE_RADIUS = GALLERY_TUBE_RADIUS_M * GALLERY_TUBE_ENVELOPE_MARGIN
 
-    return np.array(vertices, dtype=float), np.array(faces, dtype=int)
 
+@dataclass(frozen=True)
+class GeometryConfig:
+    """Parameters of the drainage-gallery acceptance geometry."""
+    z_position_m: float = 22.0
+    radius_m: float = GALLERY_TUBE_RADIUS_M
+    envelope_margin: float = GALLERY_TUBE_ENVELOPE_MARGIN
+    n_segments: int = 32
 
-def build_drainage_gallery_mesh() -> trimesh.Trimesh:
+    @property
+    def tube_radius(self) -> float:
+        return self.radius_m * self.envelope_margin
+
+
+@lru_cache(maxsize=64)
+def normalize_geometry_config(config: GeometryConfig | None) -> GeometryConfig:
     """
-    Build the CMS drainage-gallery tube mesh at z = 22 m.
+    Validate a geometry config and return it with canonical field types.
+    ``None`` means the default geometry. Cached: configs are frozen and
+    hashable, so repeat calls are a dict lookup.
+    """
+    if config is None:
+        return GeometryConfig()
+    if config.radius_m <= 0.0:
+        raise ValueError(f"Tube radius must be positive, got {config.radius_m}")
+    if config.envelope_margin <= 0.0:
+        raise ValueError(f"Envelope margin must be positive, got {config.envelope_margin}")
+    if config.n_segments < 3:
+        raise ValueError(f"Need at least 3 cross-section segments, got {config.n_segments}")
+    return GeometryConfig(
+        z_position_m=float(config.z_position_m),
+        radius_m=float(config.radius_m),
+        envelope_margin=float(config.envelope_margin),
+        n_segments=int(config.n_segments),
+    )
 
-    Uses the 'correctedVert' polyline and shifts/scales exactly as in the original
-    Higgs→LLP script:
-      - subtract 11908.8279764855 in x, add 13591.106147774964 in y
-      - divide by 1000 to go from mm (?) to m
-      - set z = 22 m
-      - radius = 1.4 * 1.1
-      - n_segments = 32
 
-    Returns:
-        mesh: trimesh.Trimesh object representing the tube volume.
+@lru_cache(maxsize=64)
+def geometry_tag(config: GeometryConfig | None = None) -> str:
+    """
+    Short stable identifier of a geometry config, for cache file names and
+    provenance fields. Cached alongside normalize_geometry_config so tagging
+    many files costs one hash total per distinct geometry.
     """
-    correctedVert = [
+    config = normalize_geometry_config(config)
+    # The config has four known fields; repr() of the normalized floats is
+    # their exact shortest form, so no JSON/sort round-trip is needed.
+    # Blake2b is the fastest stdlib digest and 64 bits is plenty for a tag.
+    payload = (
+        f"{config.z_position_m!r}|{config.radius_m!r}|"
+        f"{config.envelope_margin!r}|{config.n_segments}"
+    )
+    return hashlib.blake2b(payload.encode("ascii"), digest_size=8).hexdigest()
+
+
+def is_default_geometry_config(config: GeometryConfig | None) -> bool:
+    return normalize_geometry_config(config) == _DEFAULT_GEOMETRY_CONFIG
+
+
+_DEFAULT_GEOMETRY_CONFIG = GeometryConfig()
+
+
+# The 'correctedVert' polyline of the CMS drainage-gallery axis, as in the
+# original Higgs→LLP script, with its shifts/scales applied once at import:
+#   - subtract 11908.8279764855 in x, add 13591.106147774964 in y
+#   - divide by 1000 to go from mm (?) to m
+_CORRECTED_VERT = np.array(
+    [
         (-86.57954338701529, 0.1882163986665546),
         (-1731.590867740335, 3.764327973349282),
         (-3549.761278867689, 7.716872345365118),
@@ -206,39 +473,85 @@ def build_drainage_gallery_mesh() -> trimesh.Trimesh:
         (57028.564975437745, -9602.236010816167),
         (59539.87364405768, -9433.782334008818),
         (62050.42944708294, -9526.196585754526),
+    ],
+    dtype=float,
+)
+
+_GALLERY_PATH_XY = np.column_stack(
+    [
+        (_CORRECTED_VERT[:, 0] - 11908.8279764855) / 1000.0,
+        (_CORRECTED_VERT[:, 1] + 13591.106147774964) / 1000.0,
     ]
+)
+_GALLERY_PATH_XY.setflags(write=False)
 
-    correctedVertWithShift: list[tuple[float, float]] = []
-    for x, y in correctedVert:
-        correctedVertWithShift.append(
-            (
-                (x - 11908.8279764855) / 1000.0,
-                (y + 13591.106147774964) / 1000.0,
-            )
-        )
 
-    Z_POSITION = 22.0  # m
-    path_3d = np.array(
-        [[x, y, Z_POSITION] for x, y in correctedVertWithShift],
-        dtype=float,
+def _drainage_gallery_path(z_position_m: float = 22.0) -> np.ndarray:
+    """Return the (N, 3) polyline of the gallery axis at the given z (m)."""
+    return np.column_stack(
+        [_GALLERY_PATH_XY, np.full(len(_GALLERY_PATH_XY), z_position_m)]
     )
 
-    # Physical tube radius is ~1.4 m. Use a small envelope margin to avoid
-    # edge-effects from polygonization / discretization in this fast-acceptance
-    # model and to be robust against small geometry/alignment uncertainties.
-    tube_radius_m = 1.4
-    tube_envelope_margin = 1.1
-    tube_radius = tube_radius_m * tube_envelope_margin
-    vertices, faces = create_tube_mesh(
-        path_3d, radius=tube_radius, n_segments=32
-    )
+
+# Tube meshes are cached on disk next to the geometry/decay caches, keyed by
+# the polyline/radius/cross-section parameters so geometry edits invalidate
+# stale files automatically.
+_GEOMETRY_CACHE_DIR = Path(__file__).resolve().parents[1] / "cache"
+
+
+def _gallery_mesh_cache_path(path_3d: np.ndarray, radius: float, n_segments: int) -> Path:
+    key = hashlib.sha1(
+        repr((path_3d.tobytes(), float(radius), int(n_segments))).encode()
+    ).hexdigest()[:16]
+    return _GEOMETRY_CACHE_DIR / f"gallery_mesh_{key}.npz"
+
+
+def build_drainage_gallery_mesh(config: GeometryConfig | None = None) -> trimesh.Trimesh:
+    """
+    Build the CMS drainage-gallery tube mesh.
+
+    By default: tube of radius 1.4 * 1.1 m at z = 22 m with a 32-gon
+    cross-section along the _drainage_gallery_path polyline; pass a
+    GeometryConfig to vary the parameters. The generated vertex/face arrays
+    are cached in analysis_pbc/cache/ and reloaded on subsequent runs, and
+    the assembled Trimesh (with its ray intersector) is memoized per config,
+    so repeat calls within a process return the same instance. Callers
+    treat the mesh as read-only; copy it before mutating.
+
+    Returns:
+        mesh: trimesh.Trimesh object representing the tube volume.
+    """
+    return _build_drainage_gallery_mesh_cached(normalize_geometry_config(config))
+
+
+@lru_cache(maxsize=8)
+def _build_drainage_gallery_mesh_cached(config: GeometryConfig) -> trimesh.Trimesh:
+    path_3d = _drainage_gallery_path(config.z_position_m)
+    n_segments = config.n_segments
+    tube_radius = config.tube_radius
+
+    cache_file = _gallery_mesh_cache_path(path_3d, tube_radius, n_segments)
+    if cache_file.exists():
+        with np.load(cache_file) as cached:
+            vertices = cached["vertices"]
+            faces = cached["faces"]
+    else:
+        vertices, faces = create_tube_mesh(
+            path_3d, radius=tube_radius, n_segments=n_segments
+        )
+        try:
+            _GEOMETRY_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            np.savez(cache_file, vertices=vertices, faces=faces)
+        except OSError:
+            pass  # cache is best-effort; recompute next time
+    # create_tube_mesh emits outward-facing windings (positive volume) by
+    # construction, so no runtime volume check / invert pass is needed.
     mesh = trimesh.Trimesh(vertices=vertices, faces=faces)
 
-    if mesh.volume < 0:
-        mesh = mesh.copy()  # avoid modifying original in place
-        mesh.invert()
+    if _attach_embree_intersector(mesh):
+        print("Using Embree ray intersector")
 
-    print("Tube mesh created at z=22 m")
+    print(f"Tube mesh created at z={config.z_position_m:g} m")
     print(
         "Mesh bounds: "
         f"X:[{mesh.bounds[0][0]:.1f}, {mesh.bounds[1][0]:.1f}], "
@@ -249,16 +562,294 @@ def build_drainage_gallery_mesh() -> trimesh.Trimesh:
     return mesh
 
 
+@lru_cache(maxsize=1)
+def _gallery_segments_xy() -> tuple[np.ndarray, np.ndarray]:
+    """2D (x, y) endpoints of the gallery axis segments, computed once."""
+    path_xy = _drainage_gallery_path()[:, :2]
+    a = np.ascontiguousarray(path_xy[:-1])
+    b = np.ascontiguousarray(path_xy[1:])
+    a.setflags(write=False)
+    b.setflags(write=False)
+    return a, b
+
+
+def _gallery_xy_prefilter_mask(
+    origin: np.ndarray,
+    directions: np.ndarray,
+    z_position_m: float = 22.0,
+    tube_radius: float = GALLERY_TUBE_RADIUS,
+) -> np.ndarray:
+    """
+    Conservative 2D cull in the gallery's z plane.
+
+    The whole tube lies in a band of one radius around its z position, so a
+    hitting ray must pass within the tube radius of the axis polyline while
+    its z is inside that band. We take the (x, y) track the ray traces across
+    the band, and require its midpoint to lie within radius + half the track
+    length of the nearest polyline segment — a triangle-inequality bound, so
+    no true hit is ever dropped. Rays that cannot reach the band (moving away
+    from it) are culled outright.
+    """
+    seg_a, seg_b = _gallery_segments_xy()
+    seg_e = seg_b - seg_a
+    seg_len2 = np.einsum("ij,ij->i", seg_e, seg_e)
+
+    z_lo = z_position_m - tube_radius
+    z_hi = z_position_m + tube_radius
+    z0 = origin[2]
+    dz = directions[:, 2]
+
+    keep = np.ones(len(directions), dtype=bool)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t_a = (z_lo - z0) / dz
+        t_b = (z_hi - z0) / dz
+    t1 = np.maximum(np.minimum(t_a, t_b), 0.0)
+    t2 = np.maximum(t_a, t_b)
+
+    flat = np.abs(dz) <= 1e-12
+    in_band = (z0 >= z_lo) & (z0 <= z_hi)
+    # Flat rays inside the band are kept (infinite track); outside, culled.
+    keep[flat & ~in_band] = False
+    keep[~flat & (t2 <= 0.0)] = False
+
+    test_idx = np.flatnonzero(keep & ~flat)
+    if len(test_idx) == 0:
+        return keep
+
+    o_xy = origin[:2]
+    for start in range(0, len(test_idx), _ANALYTIC_RAY_BATCH):
+        idx = test_idx[start : start + _ANALYTIC_RAY_BATCH]
+        d_xy = directions[idx][:, :2]
+        xy1 = o_xy + t1[idx, None] * d_xy
+        xy2 = o_xy + t2[idx, None] * d_xy
+        mid = 0.5 * (xy1 + xy2)
+        half_len = 0.5 * np.linalg.norm(xy2 - xy1, axis=1)
+
+        # Distance from each midpoint to the nearest polyline segment, brute
+        # force over the 46 segments (far cheaper than any index at this size).
+        rel = mid[:, None, :] - seg_a[None, :, :]                  # (M, N, 2)
+        s = np.einsum("mnj,nj->mn", rel, seg_e) / seg_len2
+        np.clip(s, 0.0, 1.0, out=s)
+        closest = seg_a[None, :, :] + s[:, :, None] * seg_e[None, :, :]
+        d2 = np.einsum("mnj->mn", (mid[:, None, :] - closest) ** 2)
+        d_min = np.sqrt(d2.min(axis=1))
+
+        keep[idx[d_min > tube_radius + half_len]] = False
+    return keep
+
+
+def build_gallery_segments(z_position_m: float = 22.0) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Return (segs_a, segs_b): the (N_seg, 3) endpoint arrays of the gallery's
+    cylindrical segments at the given z position, for the analytic ray kernel.
+    """
+    path = _drainage_gallery_path(z_position_m)
+    return path[:-1], path[1:]
+
+
+def _is_gallery_mesh(mesh: trimesh.Trimesh, config: GeometryConfig) -> bool:
+    """
+    True when ``mesh`` is (equivalent to) the gallery tube built from
+    ``config``. preprocess_hnl_csv accepts any mesh, but the polyline-based
+    xy cull is only valid for the gallery geometry, so it must be skipped
+    for foreign meshes rather than silently dropping their hits.
+    """
+    reference = build_drainage_gallery_mesh(config)
+    if mesh is reference:
+        return True
+    return bool(np.allclose(mesh.bounds, reference.bounds, atol=1e-9))
+
+
+# Rays per internal batch of the analytic kernel; bounds the (M, N_seg)
+# broadcast temporaries to a few tens of MB.
+_ANALYTIC_RAY_BATCH = 65_536
+
+
+def _ray_cylinder_intervals(
+    origin: np.ndarray,
+    directions: np.ndarray,
+    segs_a: np.ndarray,
+    segs_b: np.ndarray,
+    radius: float,
+    xp=np,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Vectorized ray vs capped-cylinder intersection for a common origin.
+
+    For M unit-direction rays and N cylinder segments, returns (t_in, t_out)
+    of shape (M, N): the forward ray-parameter interval of ray m inside
+    segment n, NaN where the ray misses. Each segment is the intersection of
+    an infinite cylinder of the given radius with the slab between its two
+    endpoint planes, which is exactly the flat-capped cylinder the triangle
+    mesh approximates.
+
+    ``xp`` selects the array module (numpy or cupy); all inputs must already
+    live on the corresponding device.
+    """
+    axis = segs_b - segs_a
+    length = xp.linalg.norm(axis, axis=1)
+    u = axis / length[:, None]
+
+    # Everything per-segment (origin is shared by all rays).
+    w = origin[None, :] - segs_a                     # (N, 3)
+    wu = xp.einsum("ij,ij->i", w, u)                 # (N,)
+    c = xp.einsum("ij,ij->i", w, w) - wu**2 - radius**2  # (N,)
+
+    du = directions @ u.T                            # (M, N)
+    dw = directions @ w.T                            # (M, N)
+
+    a_coef = 1.0 - du**2                             # |d_perp|^2, directions are unit
+    b_half = dw - du * wu                            # B/2
+    disc = b_half**2 - a_coef * c[None, :]
+
+    err = np.errstate(divide="ignore", invalid="ignore") if xp is np else nullcontext()
+    with err:
+        sqrt_disc = xp.sqrt(disc)
+        inv_a = 1.0 / a_coef
+        tc1 = (-b_half - sqrt_disc) * inv_a
+        tc2 = (-b_half + sqrt_disc) * inv_a
+
+        # Rays (anti)parallel to the axis: inside the cylinder -> all t,
+        # outside -> none. Same for the slab planes below.
+        parallel = a_coef <= 1e-12
+        inside_cyl = c[None, :] < 0.0
+        tc1 = xp.where(parallel, xp.where(inside_cyl, -xp.inf, xp.inf), tc1)
+        tc2 = xp.where(parallel, xp.where(inside_cyl, xp.inf, -xp.inf), tc2)
+        miss_cyl = ~parallel & (disc < 0.0)
+        tc1 = xp.where(miss_cyl, xp.inf, tc1)
+        tc2 = xp.where(miss_cyl, -xp.inf, tc2)
+
+        ts_a = (0.0 - wu[None, :]) / du
+        ts_b = (length[None, :] - wu[None, :]) / du
+        ts1 = xp.minimum(ts_a, ts_b)
+        ts2 = xp.maximum(ts_a, ts_b)
+        axial = xp.abs(du) <= 1e-12
+        in_slab = (wu[None, :] >= 0.0) & (wu[None, :] <= length[None, :])
+        ts1 = xp.where(axial, xp.where(in_slab, -xp.inf, xp.inf), ts1)
+        ts2 = xp.where(axial, xp.where(in_slab, xp.inf, -xp.inf), ts2)
+
+    t_in = xp.maximum(xp.maximum(tc1, ts1), 0.0)
+    t_out = xp.minimum(tc2, ts2)
+    hit = t_out > t_in
+    t_in = xp.where(hit, t_in, xp.nan)
+    t_out = xp.where(hit, t_out, xp.nan)
+    return t_in, t_out
+
+
+def _analytic_ray_geometry(
+    origin: np.ndarray,
+    directions: np.ndarray,
+    segs_a: np.ndarray,
+    segs_b: np.ndarray,
+    radius: float,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Entry distance and in-tube path length for M rays against the analytic
+    capped-cylinder gallery. Returns (entry, path) float32 arrays of length
+    M, NaN where a ray misses every segment. Overlapping per-segment
+    intervals at the polyline joints are merged with an event sweep so the
+    path length counts each covered stretch once, matching the enter/exit
+    pairing of the mesh pipeline.
+    """
+    n_rays = len(directions)
+    entry = np.full(n_rays, np.nan, dtype=np.float32)
+    path = np.full(n_rays, np.nan, dtype=np.float32)
+
+    # The O(M * N_seg) quadratic solves run on the GPU when CuPy has a usable
+    # device; the per-hit interval sweep below is tiny and stays on the CPU.
+    xp = np
+    if cupy is not None:
+        try:
+            origin_dev = cupy.asarray(origin, dtype=cupy.float32)
+            segs_a_dev = cupy.asarray(segs_a, dtype=cupy.float32)
+            segs_b_dev = cupy.asarray(segs_b, dtype=cupy.float32)
+            xp = cupy
+        except Exception:  # pragma: no cover - no usable CUDA device
+            xp = np
+
+    for start in range(0, n_rays, _ANALYTIC_RAY_BATCH):
+        stop = min(start + _ANALYTIC_RAY_BATCH, n_rays)
+        if xp is not np:
+            t_in, t_out = _ray_cylinder_intervals(
+                origin_dev,
+                cupy.asarray(directions[start:stop], dtype=cupy.float32),
+                segs_a_dev,
+                segs_b_dev,
+                radius,
+                xp=cupy,
+            )
+            t_in = cupy.asnumpy(t_in)
+            t_out = cupy.asnumpy(t_out)
+        else:
+            t_in, t_out = _ray_cylinder_intervals(
+                origin, directions[start:stop], segs_a, segs_b, radius
+            )
+        valid = np.isfinite(t_in)
+        if not np.any(valid):
+            continue
+        ray_id, _ = np.nonzero(valid)
+        starts = t_in[valid]
+        ends = t_out[valid]
+
+        m = stop - start
+        first = np.full(m, np.inf)
+        np.minimum.at(first, ray_id, starts)
+
+        # Union of intervals per ray: sweep sorted (ray, t) events; every
+        # interval contributes +1/-1, so the running coverage returns to zero
+        # at each ray boundary and one global cumsum suffices.
+        ts = np.concatenate([starts, ends])
+        deltas = np.concatenate([np.ones(len(starts)), -np.ones(len(ends))])
+        rays2 = np.concatenate([ray_id, ray_id])
+        order = np.lexsort((-deltas, ts, rays2))
+        ts = ts[order]
+        rays2 = rays2[order]
+        cover = np.cumsum(deltas[order])
+        covered = cover[:-1] > 0
+        union = np.bincount(
+            rays2[:-1][covered], weights=(ts[1:] - ts[:-1])[covered], minlength=m
+        )
+
+        hit = np.isfinite(first)
+        entry[start:stop][hit] = first[hit]
+        path[start:stop][hit] = union[hit]
+
+    return entry, path
+
+
+# Rows per streamed CSV chunk in preprocess_hnl_csv. Bounds peak memory at
+# roughly one chunk's DataFrame plus its geometry arrays.
+_CSV_CHUNK_ROWS = 500_000
+
+
 def preprocess_hnl_csv(
     csv_file: str,
     mesh: trimesh.Trimesh,
     origin: tuple[float, float, float] = (0.0, 0.0, 0.0),
     show_progress: bool | None = None,
+    chunksize: int = _CSV_CHUNK_ROWS,
+    analytic: bool = False,
+    config: GeometryConfig | None = None,
 ) -> pd.DataFrame:
     """
     Read a Pythia HNL CSV and precompute geometry quantities
     (independent of lifetime and couplings).
 
+    The CSV is streamed in chunks of ``chunksize`` rows and the geometry
+    pipeline runs per chunk, so peak memory stays bounded for large samples;
+    the returned DataFrame is identical to processing the file in one piece.
+
+    With ``analytic=True`` the ray casting bypasses the triangle mesh and
+    intersects the exact capped-cylinder gallery instead (closed-form
+    quadratics per segment, no BVH). Hits can differ marginally from the
+    mesh path at the 32-gon polygonization envelope.
+
+    ``config`` describes the gallery geometry the mesh was built from (None
+    means the default). It parameterizes the analytic kernel and the 2D
+    polyline cull; when the mesh does not correspond to ``config`` (a caller
+    passing an arbitrary mesh), the polyline cull is skipped so no true hit
+    is dropped.
+
     Expected input columns (at minimum):
         - event
         - parent_id
@@ -314,8 +905,42 @@ def preprocess_hnl_csv(
     if show_progress is None:
         show_progress = sys.stderr.isatty()
 
-    df = pd.read_csv(csv_file)
+    origin_arr = np.array(origin, dtype=float)
+    geom_config = normalize_geometry_config(config)
 
+    frames = [
+        _preprocess_hnl_frame(
+            chunk, mesh, origin_arr, csv_file, show_progress, analytic, geom_config
+        )
+        for chunk in pd.read_csv(csv_file, chunksize=chunksize)
+    ]
+    if not frames:
+        raise ValueError(f"CSV {csv_file} contains no rows.")
+    if len(frames) == 1:
+        df = frames[0]
+    else:
+        df = pd.concat(frames, ignore_index=True)
+
+    # Sort by (parent_id, event) so downstream per-parent groupbys and masks
+    # see monotonic keys, and expose the group start offsets so consumers can
+    # slice parent blocks directly instead of re-scanning parent_id.
+    df = df.sort_values(["parent_id", "event"], kind="stable").reset_index(drop=True)
+    parent_ids = df["parent_id"].to_numpy()
+    df.attrs["parent_group_offsets"] = np.searchsorted(parent_ids, np.unique(parent_ids))
+    return df
+
+
+def _preprocess_hnl_frame(
+    df: pd.DataFrame,
+    mesh: trimesh.Trimesh,
+    origin_arr: np.ndarray,
+    csv_file: str,
+    show_progress: bool,
+    analytic: bool = False,
+    geom_config: GeometryConfig | None = None,
+) -> pd.DataFrame:
+    """Run the geometry pipeline on one in-memory chunk of the HNL CSV."""
+    geom_config = normalize_geometry_config(geom_config)
     # Handle both old and new CSV formats
     # Old format: parent_id, momentum
     # New format: parent_pdg, p
@@ -334,31 +959,34 @@ def preprocess_hnl_csv(
     if "weight" not in df.columns:
         df["weight"] = 1.0
 
-    # Initialize geometry columns
-    df["hits_tube"] = False
-    df["entry_distance"] = np.nan
-    df["path_length"] = np.nan
-
-    # beta * gamma = p / m (in natural units)
-    if "beta_gamma" not in df.columns:
-        if "momentum" in df.columns and "mass" in df.columns:
-            df["beta_gamma"] = df["momentum"] / df["mass"]
-        else:
-            raise ValueError("Cannot compute beta_gamma: missing 'beta_gamma' column or 'momentum'+'mass' columns")
-
-    origin_arr = np.array(origin, dtype=float)
+    # beta * gamma = p / m (in natural units). Kept as a standalone ndarray —
+    # like the geometry results below — and attached to the DataFrame in one
+    # df.assign at the end, so the hot path works on contiguous arrays only.
+    if "beta_gamma" in df.columns:
+        beta_gamma = None
+    elif "momentum" in df.columns and "mass" in df.columns:
+        beta_gamma = (
+            df["momentum"].to_numpy(dtype=np.float32)
+            / df["mass"].to_numpy(dtype=np.float32)
+        )
+    else:
+        raise ValueError("Cannot compute beta_gamma: missing 'beta_gamma' column or 'momentum'+'mass' columns")
 
     print(f"Precomputing geometry for {len(df)} HNLs from {csv_file} ...")
 
+    # float32 throughout the ray pipeline: ~0.1 mm resolution over the ~60 m
+    # distances involved, far below the tube radius, at half the bandwidth.
     hits_tube = np.zeros(len(df), dtype=bool)
-    entry_distance = np.full(len(df), np.nan, dtype=float)
-    path_length = np.full(len(df), np.nan, dtype=float)
+    entry_distance = np.full(len(df), np.nan, dtype=np.float32)
+    path_length = np.full(len(df), np.nan, dtype=np.float32)
 
     eta = df["eta"].to_numpy(dtype=float)
     phi = df["phi"].to_numpy(dtype=float)
 
     valid_mask = np.isfinite(eta) & np.isfinite(phi)
-    directions = eta_phi_to_directions(eta[valid_mask], phi[valid_mask])
+    directions = eta_phi_to_directions(
+        eta[valid_mask], phi[valid_mask], dtype=np.float32
+    )
     valid_dir_mask = np.all(np.isfinite(directions), axis=1)
 
     valid_indices = np.flatnonzero(valid_mask)[valid_dir_mask]
@@ -366,64 +994,109 @@ def preprocess_hnl_csv(
 
     bad_dir_count = int(len(df) - len(valid_indices))
 
+    # Cheap analytic pre-filter: the gallery has a tiny angular footprint from
+    # the interaction point, so the vast majority of rays cannot reach the mesh
+    # AABB at all. Drop them here before paying for the BVH traversal.
+    can_hit = _aabb_ray_mask(origin_arr, directions, mesh.bounds)
+    valid_indices = valid_indices[can_hit]
+    directions = directions[can_hit]
+
+    # Tighter 2D cull: distance to the axis polyline in the gallery's z
+    # plane. Only valid when the mesh actually is the configured gallery
+    # tube; for a foreign mesh the AABB test above is the only safe cull.
+    if _is_gallery_mesh(mesh, geom_config):
+        xy_ok = _gallery_xy_prefilter_mask(
+            origin_arr, directions, geom_config.z_position_m, geom_config.tube_radius
+        )
+        valid_indices = valid_indices[xy_ok]
+        directions = directions[xy_ok]
+
+    if analytic:
+        segs_a, segs_b = build_gallery_segments(geom_config.z_position_m)
+        entry_t, path_t = _analytic_ray_geometry(
+            origin_arr, directions, segs_a, segs_b, geom_config.tube_radius
+        )
+        hit_mask = np.isfinite(entry_t)
+        hit_rows = valid_indices[hit_mask]
+        hits_tube[hit_rows] = True
+        entry_distance[hit_rows] = entry_t[hit_mask]
+        path_length[hit_rows] = path_t[hit_mask]
+        if bad_dir_count > 0:
+            print(f"[WARN] Skipped {bad_dir_count} HNL(s) with non-finite or degenerate directions.")
+        return _finalize_frame(df, hits_tube, entry_distance, path_length, beta_gamma)
+
+    batch_size = _RAY_BATCH_SIZE_EMBREE if _uses_embree(mesh) else _RAY_BATCH_SIZE_DEFAULT
+    n_batches = (len(valid_indices) + batch_size - 1) // batch_size
+    cast_size = batch_size
+
     def _intersects_location_safe(
         ray_origins: np.ndarray,
         ray_directions: np.ndarray,
-        offset: int = 0,
     ) -> tuple[np.ndarray, np.ndarray, int]:
-        try:
-            locations, index_ray, _ = mesh.ray.intersects_location(
-                ray_origins=ray_origins,
-                ray_directions=ray_directions,
-            )
-            return locations, index_ray + offset, 0
-        except RTreeError:
-            n = len(ray_directions)
-            if n <= 1:
-                return np.empty((0, 3), dtype=float), np.empty((0,), dtype=int), 1
-            mid = n // 2
-            loc_a, idx_a, err_a = _intersects_location_safe(ray_origins[:mid], ray_directions[:mid], offset=offset)
-            loc_b, idx_b, err_b = _intersects_location_safe(
-                ray_origins[mid:], ray_directions[mid:], offset=offset + mid
-            )
-            if len(loc_a) == 0:
-                loc = loc_b
-            elif len(loc_b) == 0:
-                loc = loc_a
-            else:
-                loc = np.concatenate([loc_a, loc_b], axis=0)
-            if len(idx_a) == 0:
-                idx = idx_b
-            elif len(idx_b) == 0:
-                idx = idx_a
-            else:
-                idx = np.concatenate([idx_a, idx_b], axis=0)
-            return loc, idx, err_a + err_b
-
-    rtree_errors = 0
-    batch_size = 10_000
-    n_batches = (len(valid_indices) + batch_size - 1) // batch_size
-    iterator = range(0, len(valid_indices), batch_size)
-    if show_progress:
-        iterator = tqdm(iterator, total=n_batches, desc="Geometry rays", unit="batch")
-
-    for start in iterator:
+        """
+        Cast rays, halving the sub-batch size on RTreeError and retrying from
+        the failed position. The reduced size sticks for the rest of the file
+        (rtree failures are load-dependent, not ray-dependent); single rays
+        that still fail are counted and skipped. The happy path is one
+        backend call with no slicing or concatenation.
+        """
+        nonlocal cast_size
+        n = len(ray_directions)
+        n_err = 0
+        parts_loc: list[np.ndarray] = []
+        parts_idx: list[np.ndarray] = []
+        pos = 0
+        while pos < n:
+            size = min(cast_size, n - pos)
+            try:
+                loc, idx, _ = mesh.ray.intersects_location(
+                    ray_origins=ray_origins[pos : pos + size],
+                    ray_directions=ray_directions[pos : pos + size],
+                )
+            except RTreeError:
+                if size <= 1:
+                    n_err += 1
+                    pos += 1
+                    continue
+                cast_size = size // 2
+                continue
+            if len(idx):
+                parts_loc.append(loc)
+                parts_idx.append(idx + pos)
+            pos += size
+        if not parts_idx:
+            return np.empty((0, 3), dtype=float), np.empty((0,), dtype=int), n_err
+        if len(parts_idx) == 1:
+            return parts_loc[0], parts_idx[0], n_err
+        return np.concatenate(parts_loc, axis=0), np.concatenate(parts_idx, axis=0), n_err
+
+    # One contiguous origin buffer shared (read-only) by all batches; each
+    # batch slices it instead of re-materializing the constant vector.
+    origin_buf = np.empty((min(batch_size, len(valid_indices)) or 1, 3), dtype=float)
+    origin_buf[:] = origin_arr
+
+    def _run_batch(start: int) -> int:
+        """Cast one batch of rays and scatter results; returns RTreeError count.
+
+        Batches write to disjoint dataframe rows, so concurrent execution
+        needs no locking.
+        """
         end = min(start + batch_size, len(valid_indices))
         idx_chunk = valid_indices[start:end]
         dir_chunk = directions[start:end]
-        origin_chunk = np.repeat(origin_arr[None, :], len(dir_chunk), axis=0)
-
-        locations, index_ray, n_err = _intersects_location_safe(origin_chunk, dir_chunk, offset=0)
-        rtree_errors += n_err
+        origin_chunk = origin_buf[: len(dir_chunk)]
 
+        locations, index_ray, n_err = _intersects_location_safe(origin_chunk, dir_chunk)
         if len(locations) == 0:
-            continue
+            return n_err
 
-        deltas = locations - origin_arr[None, :]
-        t = np.einsum("ij,ij->i", deltas, dir_chunk[index_ray])
+        # Directions are unit vectors, so the ray parameter is just the
+        # distance from the origin; no need to gather directions per hit.
+        # Intersection points arrive in float64; sort and reduce in float32.
+        t = np.linalg.norm(locations - origin_arr, axis=1).astype(np.float32, copy=False)
         mask_t = np.isfinite(t) & (t > 0.0)
         if not np.any(mask_t):
-            continue
+            return n_err
 
         t = t[mask_t]
         index_ray = index_ray[mask_t]
@@ -432,20 +1105,30 @@ def preprocess_hnl_csv(
         t = t[order]
         index_ray = index_ray[order]
 
-        rays, counts = np.unique(index_ray, return_counts=True)
-        pos = 0
-        for ray, count in zip(rays, counts):
-            ts = t[pos : pos + count]
-            pos += count
-            if len(ts) < 2:
-                continue
-            n_pairs = len(ts) // 2
-            entry_val = float(ts[0])
-            path_val = float(np.sum(ts[1 : 2 * n_pairs : 2] - ts[0 : 2 * n_pairs : 2]))
-            df_idx = int(idx_chunk[int(ray)])
-            hits_tube[df_idx] = True
-            entry_distance[df_idx] = entry_val
-            path_length[df_idx] = path_val
+        _reduce_hits(
+            t,
+            index_ray.astype(np.int64),
+            idx_chunk.astype(np.int64),
+            hits_tube,
+            entry_distance,
+            path_length,
+        )
+        return n_err
+
+    starts = range(0, len(valid_indices), batch_size)
+    # Embree releases the GIL during traversal, so disjoint batches scale with
+    # threads. The default backend holds the GIL; run it sequentially.
+    if _uses_embree(mesh) and n_batches >= 2:
+        with ThreadPoolExecutor() as pool:
+            results = pool.map(_run_batch, starts)
+            if show_progress:
+                results = tqdm(results, total=n_batches, desc="Geometry rays", unit="batch")
+            rtree_errors = sum(results)
+    else:
+        iterator = starts
+        if show_progress:
+            iterator = tqdm(iterator, total=n_batches, desc="Geometry rays", unit="batch")
+        rtree_errors = sum(_run_batch(start) for start in iterator)
 
     if bad_dir_count > 0:
         print(f"[WARN] Skipped {bad_dir_count} HNL(s) with non-finite or degenerate directions.")
@@ -453,7 +1136,22 @@ def preprocess_hnl_csv(
     if rtree_errors > 0:
         print(f"[WARN] Skipped {rtree_errors} ray batch(es)/ray(s) due to RTreeError in ray-mesh intersection.")
 
-    df["hits_tube"] = hits_tube
-    df["entry_distance"] = entry_distance
-    df["path_length"] = path_length
-    return df
+    return _finalize_frame(df, hits_tube, entry_distance, path_length, beta_gamma)
+
+
+def _finalize_frame(
+    df: pd.DataFrame,
+    hits_tube: np.ndarray,
+    entry_distance: np.ndarray,
+    path_length: np.ndarray,
+    beta_gamma: np.ndarray | None,
+) -> pd.DataFrame:
+    """Attach the computed columns to the chunk DataFrame in a single assign."""
+    columns = {
+        "hits_tube": hits_tube,
+        "entry_distance": entry_distance,
+        "path_length": path_length,
+    }
+    if beta_gamma is not None:
+        columns["beta_gamma"] = beta_gamma
+    return df.assign(**columns)
@@ -0,0 +1,71 @@
+"""
+Shared parser for HNL production filenames.
+
+Both combine_production_channels.py and run.py consume files named
+
+    HNL_{mass}GeV_{flavour}_{regime}[_ff][_direct|_fromTau].csv
+
+with 1- or 2-decimal mass tokens (5p0 or 5p00). Keeping the grammar in one
+place stops the two copies drifting; the token-by-token checks against small
+frozensets match the old alternation regexes without backtracking.
+"""
+
+from typing import NamedTuple
+
+# Production regimes written by the Pythia/MadGraph generators.
+BASE_REGIMES = frozenset({"kaon", "charm", "beauty", "ew"})
+# The analysis driver additionally recognizes the merged output of
+# combine_production_channels.py.
+ANALYSIS_REGIMES = BASE_REGIMES | {"combined"}
+MODES = frozenset({"direct", "fromTau"})
+
+
+class HNLName(NamedTuple):
+    mass_val: float
+    mass_str: str  # original mass token, e.g. "5p0" or "5p00"
+    flavour: str
+    base_regime: str
+    mode: "str | None"
+    is_ff: bool
+
+
+def parse_hnl_name(name: str, regimes: frozenset = BASE_REGIMES) -> "HNLName | None":
+    """Parse a production filename; returns None if it does not match."""
+    if not (name.startswith("HNL_") and name.endswith(".csv")):
+        return None
+    tokens = name[4:-4].split("_")
+    if len(tokens) < 3:
+        return None
+
+    mass_tok = tokens[0]
+    if not mass_tok.endswith("GeV"):
+        return None
+    mass_str = mass_tok[:-3]
+    whole, sep, frac = mass_str.partition("p")
+    if not (
+        sep and mass_tok.isascii()
+        and whole.isdigit() and frac.isdigit() and len(frac) <= 2
+    ):
+        return None
+
+    flavour = tokens[1]
+    if not (flavour.isascii() and flavour.isalpha() and flavour.islower()):
+        return None
+
+    regime = tokens[2]
+    if regime not in regimes:
+        return None
+
+    is_ff = False
+    mode = None
+    rest = tokens[3:]
+    if rest and rest[0] == "ff":
+        is_ff = True
+        rest = rest[1:]
+    if rest and rest[0] in MODES:
+        mode = rest[0]
+        rest = rest[1:]
+    if rest:
+        return None
+
+    return HNLName(float(f"{whole}.{frac}"), mass_str, flavour, regime, mode, is_ff)
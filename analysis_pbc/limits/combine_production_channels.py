@@ -45,11 +45,86 @@ Typical workflow:
     5. Generate plots: python ../money_plot/plot_money_island.py
 """
 
+import numpy as np
+import os
 import pandas as pd
-import re
 from pathlib import Path
 import argparse
+import gzip
+import io
+import sys
 from collections import defaultdict
+import contextlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import NamedTuple
+
+ANALYSIS_ROOT = Path(__file__).resolve().parents[1]
+if str(ANALYSIS_ROOT) not in sys.path:
+    sys.path.insert(0, str(ANALYSIS_ROOT))
+
+from limits._hnl_filename import parse_hnl_name
+
+# Files below this size hold a header but no usable events.
+_MIN_CSV_BYTES = 1000
+
+# Optional: PyArrow's CSV parser is SIMD-accelerated and multi-threaded,
+# typically several times faster than pandas' C engine on these numeric files.
+try:
+    import pyarrow as _pa
+    import pyarrow.csv as _pacsv
+    import pyarrow.parquet as _papq
+except Exception:  # pragma: no cover - optional dependency
+    _pa = None
+    _pacsv = None
+    _papq = None
+
+
+def _read_production_csv(path, dtype=None) -> pd.DataFrame:
+    """
+    Read one production CSV, via PyArrow when available.
+
+    The pandas fallback mmaps the file (no userspace copy of every byte, OS
+    page cache does the prefetching) and, given a ``dtype`` map from an
+    already-parsed sibling file, skips pandas' type-inference second pass.
+    """
+    if _pacsv is not None:
+        return _pacsv.read_csv(str(path)).to_pandas()
+    if dtype:
+        try:
+            return pd.read_csv(
+                path, engine="c", memory_map=True, low_memory=False, dtype=dtype
+            )
+        except ValueError:
+            # The donor file can under-type a shared column (e.g. every weight
+            # written as "1" infers int64 while this file holds fractions);
+            # fall back to full inference for this file rather than crash.
+            pass
+    return pd.read_csv(path, engine="c", memory_map=True, low_memory=False)
+
+
+def _csv_dtype_map(path, dtype_map):
+    """Restrict ``dtype_map`` to the columns actually present in ``path``."""
+    with open(path) as fh:
+        columns = fh.readline().rstrip("\n").split(",")
+    return {c: dtype_map[c] for c in columns if c in dtype_map}
+
+
+class SourceFile(NamedTuple):
+    """One production file record, with its display label precomputed."""
+    base_regime: str
+    mode: "str | None"
+    is_ff: bool
+    path: Path
+    label: str
+
+
+def _format_source_label(base_regime: str, mode: str | None, is_ff: bool) -> str:
+    label = base_regime
+    if is_ff:
+        label += "_ff"
+    if mode:
+        label += f"_{mode}"
+    return label
 
 
 def find_production_files(sim_dir, flavour=None):
@@ -57,33 +132,37 @@ def find_production_files(sim_dir, flavour=None):
     Find all production CSV files and group by mass.
 
     Returns:
-        dict: {(mass_val, flavour): [(base_regime, mode, is_ff, filepath), ...]}
-    """
-    # Accept both 1 and 2 decimal formats during transition: 5p0 or 5p00
-    pattern = re.compile(
-        r"HNL_([0-9]+p[0-9]{1,2})GeV_([a-z]+)_((?:kaon|charm|beauty|ew)(?:_ff)?)(?:_(direct|fromTau))?\.csv"
-    )
+        dict: {(mass_val, flavour): [SourceFile, ...]}
 
+    SourceFile.label is the display form (e.g. ``beauty_ff_fromTau``),
+    computed once here so printout sites don't rebuild it per use.
+    """
     files_by_mass = defaultdict(list)
 
-    for f in sim_dir.glob("HNL_*.csv"):
-        if f.stat().st_size < 1000:  # Skip empty
-            continue
-
-        match = pattern.search(f.name)
-        if match:
-            mass_str = match.group(1)
-            file_flavour = match.group(2)
-            regime = match.group(3)  # e.g., beauty or beauty_ff
-            mode = match.group(4)    # direct/fromTau (tau only) or None
-
-            if flavour and file_flavour != flavour:
+    # os.scandir gives the name and (on Linux) a cached stat in one pass,
+    # halving syscalls vs glob + per-file Path.stat(); Path objects are only
+    # built for entries that survive all the filters.
+    with os.scandir(sim_dir) as entries:
+        for entry in entries:
+            name = entry.name
+            if not (name.startswith("HNL_") and name.endswith(".csv")):
                 continue
 
-            mass_val = float(mass_str.replace('p', '.'))
-            is_ff = regime.endswith("_ff")
-            base_regime = regime.replace("_ff", "")
-            files_by_mass[(mass_val, file_flavour)].append((base_regime, mode, is_ff, f))
+            # Parse the name before touching stat: on filesystems without a
+            # cached DirEntry stat, non-matching files then cost no syscall.
+            parsed = parse_hnl_name(name)
+            if parsed is not None:
+                if flavour and parsed.flavour != flavour:
+                    continue
+                if entry.stat().st_size < _MIN_CSV_BYTES:  # Skip empty
+                    continue
+
+                files_by_mass[(parsed.mass_val, parsed.flavour)].append(
+                    SourceFile(
+                        parsed.base_regime, parsed.mode, parsed.is_ff, Path(entry.path),
+                        _format_source_label(parsed.base_regime, parsed.mode, parsed.is_ff),
+                    )
+                )
 
     return files_by_mass
 
@@ -91,54 +170,216 @@ def find_production_files(sim_dir, flavour=None):
 def prefer_ff(regime_files):
     """
     If both base and *_ff versions exist for the same regime, keep only the *_ff version.
-    regime_files: list of (base_regime, mode, is_ff, path)
+    regime_files: list of SourceFile records
     Returns filtered list.
     """
     chosen = {}
-    for base_regime, mode, is_ff, path in regime_files:
-        key = (base_regime, mode)
-        keep_current = key not in chosen or is_ff
+    for record in regime_files:
+        key = (record.base_regime, record.mode)
+        keep_current = key not in chosen or record.is_ff
         if keep_current:
-            chosen[key] = (base_regime, mode, is_ff, path)
+            chosen[key] = record
     return list(chosen.values())
 
 
-def _format_source_label(base_regime: str, mode: str | None, is_ff: bool) -> str:
-    label = base_regime
-    if is_ff:
-        label += "_ff"
-    if mode:
-        label += f"_{mode}"
-    return label
-
-
-def combine_csvs(csv_paths, output_path):
+def _stream_combine_csvs(csv_paths, output_path, compress=False):
+    """
+    Combine CSVs at the byte level without materializing any DataFrame.
+
+    Requires every input to share the exact header line, with ``event`` as
+    the first column (the standard Pythia/MadGraph layout): data lines are
+    then copied through with the event field renumbered and the provenance
+    fields appended as a constant suffix. Returns the combined row count,
+    or None if the inputs do not satisfy the layout (caller falls back to
+    the in-memory combine).
+    """
+    headers = []
+    for record in csv_paths:
+        with open(record.path, "rb") as fh:
+            headers.append(fh.readline().rstrip(b"\r\n"))
+    if len(set(headers)) != 1:
+        return None
+    header = headers[0].decode()
+    if header.split(",", 1)[0] != "event":
+        return None
+
+    event = 0
+    log = io.StringIO()
+    # gzip level 1 keeps compression CPU well below disk-write cost.
+    opener = (lambda p: gzip.open(p, "wb", compresslevel=1)) if compress else (lambda p: open(p, "wb"))
+    with opener(output_path) as out:
+        out.write(f"{header},source_regime,source_mode,source_is_ff\n".encode())
+        for record in csv_paths:
+            suffix = (
+                f",{record.base_regime},"
+                f"{record.mode if record.mode is not None else 'direct'},"
+                f"{record.is_ff}\n"
+            ).encode()
+            file_start = event
+            n_malformed = 0
+            with open(record.path, "rb") as fh:
+                fh.readline()  # header
+                for line in fh:
+                    line = line.rstrip(b"\r\n")
+                    if not line:
+                        continue
+                    parts = line.split(b",", 1)
+                    if len(parts) != 2:
+                        # e.g. a truncated last line from a killed generator
+                        # job; skip it rather than abort the whole combine.
+                        n_malformed += 1
+                        continue
+                    out.write(b"%d,%s%s" % (event, parts[1], suffix))
+                    event += 1
+            log.write(f"    {record.label:16s}: {event - file_start:6d} HNLs\n")
+            if n_malformed:
+                log.write(
+                    f"    [WARN] {record.path.name}: "
+                    f"skipped {n_malformed} malformed line(s)\n"
+                )
+    sys.stdout.write(log.getvalue())
+    return event
+
+
+def combine_csvs(csv_paths, output_path, output_format="csv"):
     """
     Combine multiple CSV files into one, preserving all columns.
 
     All files should have the same column structure (Pythia/MadGraph format):
     event, weight, hnl_id, parent_pdg, pt, eta, phi, p, E, mass, prod_x_mm, prod_y_mm, prod_z_mm, beta_gamma
-    """
-    dfs = []
 
-    for base_regime, mode, is_ff, path in csv_paths:
-        df = pd.read_csv(path)
-        # Add provenance columns for tracking
-        df["source_regime"] = base_regime
-        df["source_mode"] = mode if mode is not None else "direct"
-        df["source_is_ff"] = bool(is_ff)
-        dfs.append(df)
-        print(f"    {_format_source_label(base_regime, mode, is_ff):16s}: {len(df):6d} HNLs")
-
-    combined = pd.concat(dfs, ignore_index=True)
+    For CSV output (plain or gzipped), inputs sharing an identical header
+    are streamed straight to the output file; heterogeneous inputs (and
+    parquet output) go through the in-memory combine below.
+    """
+    if output_format in ("csv", "csv.gz"):
+        n_streamed = _stream_combine_csvs(
+            csv_paths, output_path, compress=output_format == "csv.gz"
+        )
+        if n_streamed is not None:
+            print(f"    → Combined: {n_streamed:6d} HNLs → {output_path.name}")
+            return n_streamed
+
+    if _pa is not None:
+        # Concatenate at the Arrow level: appending a constant column and
+        # concat_tables are zero-copy chunked-array operations, and pandas
+        # materialization happens once at the end instead of per-file.
+        def _const_str_column(value: str, n: int):
+            # Dictionary encoding stores the label once plus an int32 index
+            # per row, instead of n copies of the string.
+            return _pa.DictionaryArray.from_arrays(
+                _pa.array(np.zeros(n, dtype=np.int32)), _pa.array([value])
+            )
+
+        tables = []
+        log = io.StringIO()
+        for record in csv_paths:
+            table = _pacsv.read_csv(str(record.path))
+            n = table.num_rows
+            table = table.append_column("source_regime", _const_str_column(record.base_regime, n))
+            table = table.append_column(
+                "source_mode",
+                _const_str_column(record.mode if record.mode is not None else "direct", n),
+            )
+            # Stored as the Python bool's repr so the written CSV matches the
+            # True/False spelling of the streaming and pandas paths.
+            table = table.append_column("source_is_ff", _const_str_column(str(record.is_ff), n))
+            tables.append(table)
+            log.write(f"    {record.label:16s}: {n:6d} HNLs\n")
+
+        combined_tbl = _pa.concat_tables(tables, promote_options="default")
+
+        # Renumber events and write through Arrow's multi-threaded CSV
+        # writer, never materializing a pandas frame.
+        total = combined_tbl.num_rows
+        event_dtype = np.int32 if total <= np.iinfo(np.int32).max else np.int64
+        event_arr = _pa.array(np.arange(total, dtype=event_dtype))
+        event_idx = combined_tbl.schema.get_field_index("event")
+        if event_idx >= 0:
+            combined_tbl = combined_tbl.set_column(event_idx, "event", event_arr)
+        else:
+            combined_tbl = combined_tbl.append_column("event", event_arr)
+        if output_format == "parquet":
+            _papq.write_table(combined_tbl, str(output_path), compression="snappy")
+        elif output_format == "csv.gz":
+            with _pa.CompressedOutputStream(str(output_path), "gzip") as gz:
+                _pacsv.write_csv(combined_tbl, gz)
+        else:
+            _pacsv.write_csv(combined_tbl, str(output_path))
+        log.write(f"    → Combined: {total:6d} HNLs → {output_path.name}\n")
+        sys.stdout.write(log.getvalue())
+        return total
+    else:
+        # pd.read_csv releases the GIL while parsing, so reading the input
+        # files on a small thread pool overlaps I/O and parse across files.
+        # The first file's inferred dtypes are reused for the rest (filtered
+        # to each file's own header in case the layouts differ).
+        first = _read_production_csv(csv_paths[0].path)
+        dtype_map = dict(first.dtypes.items())
+        rest = csv_paths[1:]
+        if rest:
+            with ThreadPoolExecutor(max_workers=min(8, len(rest))) as pool:
+                dfs = [first] + list(pool.map(
+                    lambda rec: _read_production_csv(
+                        rec.path, dtype=_csv_dtype_map(rec.path, dtype_map)
+                    ),
+                    rest,
+                ))
+        else:
+            dfs = [first]
+
+        log = io.StringIO()
+        lengths = []
+        regime_vals, mode_vals, ff_vals = [], [], []
+        for record, df in zip(csv_paths, dfs):
+            lengths.append(len(df))
+            regime_vals.append(record.base_regime)
+            mode_vals.append(record.mode if record.mode is not None else "direct")
+            ff_vals.append(record.is_ff)
+            log.write(f"    {record.label:16s}: {len(df):6d} HNLs\n")
+
+        combined = pd.concat(dfs, ignore_index=True)
+        # Provenance is constant per input frame: one np.repeat per column
+        # after the concat replaces a full-length column allocation per file.
+        # The string columns are categorical — integer codes per row instead
+        # of a string pointer each (the Arrow path dictionary-encodes the
+        # same way), and to_csv output is unchanged.
+        combined["source_regime"] = pd.Categorical(np.repeat(regime_vals, lengths))
+        combined["source_mode"] = pd.Categorical(np.repeat(mode_vals, lengths))
+        combined["source_is_ff"] = np.repeat(ff_vals, lengths)
+
+    # Renumber events to avoid conflicts; int32 covers any realistic row
+    # count at half the memory of the default int64.
+    event_dtype = np.int32 if len(combined) <= np.iinfo(np.int32).max else np.int64
+    combined['event'] = np.arange(len(combined), dtype=event_dtype)
+
+    if output_format == "parquet":
+        combined.to_parquet(output_path, index=False, compression="snappy")
+    elif output_format == "csv.gz":
+        combined.to_csv(
+            output_path, index=False, chunksize=100_000, lineterminator="\n",
+            compression={"method": "gzip", "compresslevel": 1},
+        )
+    else:
+        # chunksize + explicit lineterminator keep to_csv on its C fast path.
+        combined.to_csv(output_path, index=False, chunksize=100_000, lineterminator="\n")
+    log.write(f"    → Combined: {len(combined):6d} HNLs → {output_path.name}\n")
+    sys.stdout.write(log.getvalue())
 
-    # Renumber events to avoid conflicts
-    combined['event'] = range(len(combined))
+    return len(combined)
 
-    combined.to_csv(output_path, index=False)
-    print(f"    → Combined: {len(combined):6d} HNLs → {output_path.name}")
 
-    return len(combined)
+def _combine_one_mass(task):
+    """
+    Worker for --parallel: combine one mass point with stdout captured, so
+    per-mass output can be printed without interleaving across processes.
+    Returns (mass_val, flavour, n_total, captured_output).
+    """
+    mass_val, flavour, csv_list, output_path, output_format = task
+    buf = io.StringIO()
+    with contextlib.redirect_stdout(buf):
+        n_total = combine_csvs(csv_list, output_path, output_format=output_format)
+    return mass_val, flavour, n_total, buf.getvalue()
 
 
 def main():
@@ -147,6 +388,13 @@ def main():
     parser.add_argument("--dry-run", action="store_true", help="Show what would be done without writing files")
     parser.add_argument("--no-cleanup", action="store_true", help="Don't move combined files, just create them in a temporary folder")
     parser.add_argument("--delete-originals", action="store_true", help="Delete original files after combining (opt-in)")
+    parser.add_argument("--parallel", action="store_true", help="Combine mass points in parallel (processes)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker count for --parallel (default: all cores)")
+    parser.add_argument(
+        "--format", choices=["csv", "csv.gz", "parquet"], default="csv",
+        help="Combined output format. Note: the analysis pipeline (limits/run.py) "
+             "consumes plain CSV; csv.gz and parquet are for archival/external tooling.",
+    )
     args = parser.parse_args()
 
     # Paths
@@ -168,15 +416,15 @@ def main():
         print("DRY RUN MODE - no files will be written")
     print()
 
-    # Find all files grouped by mass
-    files_by_mass = find_production_files(sim_dir, args.flavour)
-    # Prefer *_ff replacements over base regimes to avoid double counting
-    files_by_mass = {
-        key: prefer_ff(regimes) for key, regimes in files_by_mass.items()
-    }
-
-    # Find masses with multiple production channels
-    multi_channel_masses = {k: v for k, v in files_by_mass.items() if len(v) > 1}
+    # Find all files grouped by mass, prefer *_ff replacements over base
+    # regimes to avoid double counting, and keep only masses with multiple
+    # production channels — one pass, no intermediate per-mass dict for the
+    # (majority) singleton entries.
+    multi_channel_masses = {}
+    for key, regimes in find_production_files(sim_dir, args.flavour).items():
+        chosen = prefer_ff(regimes)
+        if len(chosen) > 1:
+            multi_channel_masses[key] = chosen
 
     if not multi_channel_masses:
         print("✓ No overlapping production channels found")
@@ -186,36 +434,50 @@ def main():
     print(f"Found {len(multi_channel_masses)} masses with multiple production channels:\n")
 
     for (mass_val, flavour), regimes in sorted(multi_channel_masses.items()):
-        regime_names = [_format_source_label(r, m, ff) for r, m, ff, _ in regimes]
+        regime_names = [record.label for record in regimes]
         print(f"  m = {mass_val:5.1f} GeV ({flavour}): {', '.join(regime_names)}")
 
     print(f"\n{'-' * 70}\n")
 
     # Combine files
     total_combined = 0
-    files_to_backup = []
+    files_to_backup = set()
 
+    tasks = []
     for (mass_val, flavour), csv_list in sorted(multi_channel_masses.items()):
         # Use 2 decimal places for consistency (5.0 → 5p00, not 5p0)
         mass_str = f"{mass_val:.2f}".replace('.', 'p')
-        output_path = combined_dir / f"HNL_{mass_str}GeV_{flavour}_combined.csv"
-
-        print(f"Mass {mass_val} GeV ({flavour}):")
+        output_path = combined_dir / f"HNL_{mass_str}GeV_{flavour}_combined.{args.format}"
 
         if args.dry_run:
+            print(f"Mass {mass_val} GeV ({flavour}):")
             print(f"    [DRY RUN] Would combine {len(csv_list)} files")
-            for base_regime, mode, is_ff, fpath in csv_list:
-                print(f"              - {_format_source_label(base_regime, mode, is_ff)}: {fpath.name}")
+            for record in csv_list:
+                print(f"              - {record.label}: {record.path.name}")
             continue
 
-        n_total = combine_csvs(csv_list, output_path)
-        total_combined += 1
-
-        # Track original files for deletion
-        for _, _, _, fpath in csv_list:
-            files_to_backup.append(fpath)
-
-        print()
+        tasks.append((mass_val, flavour, csv_list, output_path, args.format))
+        for record in csv_list:
+            files_to_backup.add(record.path)
+
+    if args.parallel and len(tasks) > 1:
+        # Mass points are independent (disjoint inputs and outputs), so
+        # parse + write runs across processes; each worker returns its
+        # captured output and the combine summaries print in mass order.
+        n_workers = args.workers or min(len(tasks), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            for mass_val, flavour, _, output in pool.map(_combine_one_mass, tasks):
+                print(f"Mass {mass_val} GeV ({flavour}):")
+                sys.stdout.write(output)
+                total_combined += 1
+                print()
+    else:
+        for task in tasks:
+            mass_val, flavour, _, output = _combine_one_mass(task)
+            print(f"Mass {mass_val} GeV ({flavour}):")
+            sys.stdout.write(output)
+            total_combined += 1
+            print()
 
     # Cleanup: move combined files (optionally delete originals)
     if not args.dry_run and not args.no_cleanup:
@@ -223,12 +485,14 @@ def main():
         print("CLEANUP: Moving combined files")
         print(f"{'-' * 70}\n")
 
-        # Move combined files to main directory
-        combined_files = list(combined_dir.glob("*.csv"))
-        for f in combined_files:
-            dest = sim_dir / f.name
-            f.rename(dest)
-            print(f"  ✓ {f.name} → {sim_dir.name}/")
+        # Move combined files to main directory in one scandir pass
+        suffix = f".{args.format}"
+        with os.scandir(combined_dir) as entries:
+            for entry in entries:
+                if not entry.name.endswith(suffix):
+                    continue
+                os.rename(entry.path, os.path.join(str(sim_dir), entry.name))
+                print(f"  ✓ {entry.name} → {sim_dir.name}/")
 
         if args.delete_originals:
             # Delete original overlapping files (they're now combined)
@@ -238,15 +502,18 @@ def main():
                     f.unlink()
                     print(f"  ✓ Deleted: {f.name}")
 
-        # Remove empty combined directory
-        if combined_dir.exists() and not any(combined_dir.iterdir()):
-            combined_dir.rmdir()
+        # Remove the combined directory; rmdir fails harmlessly if files
+        # from another format/run are still in it.
+        try:
+            os.rmdir(combined_dir)
+        except OSError:
+            pass
 
     print("\n" + "=" * 70)
     if args.dry_run:
         print(f"DRY RUN: Would create {len(multi_channel_masses)} combined files")
         if args.delete_originals:
-            print(f"         Would delete {len(set(files_to_backup))} original files")
+            print(f"         Would delete {len(files_to_backup)} original files")
     elif args.no_cleanup:
         print(f"✓ Created {total_combined} combined files in: {combined_dir}")
         print(f"\nManual steps needed:")
@@ -256,9 +523,9 @@ def main():
         print(f"✓ Created {total_combined} combined files")
         print(f"✓ Moved to {sim_dir}")
         if args.delete_originals:
-            print(f"✓ Deleted {len(set(files_to_backup))} original files (data preserved in combined files)")
+            print(f"✓ Deleted {len(files_to_backup)} original files (data preserved in combined files)")
         else:
-            print(f"• Kept {len(set(files_to_backup))} original files")
+            print(f"• Kept {len(files_to_backup)} original files")
         print(f"\n Ready to run analysis: python limits/run.py")
     print("=" * 70)
 
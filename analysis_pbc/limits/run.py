@@ -13,7 +13,6 @@ Usage:
 """
 
 import sys
-import re
 import os
 import io
 import tempfile
@@ -45,6 +44,7 @@ MASS_FILTER_TOL = 5e-4  # GeV tolerance for --mass filtering
 
 from geometry.per_parent_efficiency import build_drainage_gallery_mesh, preprocess_hnl_csv
 from limits.expected_signal import expected_signal_events, couplings_from_eps2
+from limits._hnl_filename import ANALYSIS_REGIMES, parse_hnl_name
 from limits.timing_utils import _time_block
 
 
@@ -330,35 +330,23 @@ def run_flavour(
     print(f"FLAVOUR: {flavour.upper()} (Benchmark {benchmark})")
     print(f"{'='*60}")
 
-    # Find simulation files
-    # Accept both 1 and 2 decimal formats: 5p0 or 5p00 (transitioning to 2-decimal standard)
-    pattern = re.compile(
-        rf"^HNL_([0-9]+p[0-9]{{1,2}})GeV_{flavour}_"
-        r"((?:kaon|charm|beauty|ew|combined)(?:_ff)?)"
-        r"(?:_(direct|fromTau))?"
-        r"\.csv$"
-    )
-
+    # Find simulation files. The shared parser accepts both 1- and 2-decimal
+    # mass formats (5p0 or 5p00 — transitioning to 2-decimal standard); the
+    # driver additionally recognizes the merged "combined" regime.
     files = []
     empty_files = []  # Track empty files, report only if they would be used
     for f in SIM_DIR.glob(f"*{flavour}*.csv"):
-        match = pattern.search(f.name)
-        if not match:
+        parsed = parse_hnl_name(f.name, regimes=ANALYSIS_REGIMES)
+        if parsed is None or parsed.flavour != flavour:
             continue
 
         if f.stat().st_size < 1000:  # Track empty files for later reporting
             empty_files.append(f)
             continue
 
-        mass_str = match.group(1)
-        mass_val = float(mass_str.replace("p", "."))
-        regime_token = match.group(2)          # e.g. charm, charm_ff, combined
-        mode = match.group(3)                 # direct/fromTau (tau only) or None
-
-        is_ff = regime_token.endswith("_ff")
-        base_regime = regime_token.replace("_ff", "")
-
-        files.append((mass_val, mass_str, base_regime, mode, is_ff, f))
+        files.append(
+            (parsed.mass_val, parsed.mass_str, parsed.base_regime, parsed.mode, parsed.is_ff, f)
+        )
 
     # Group by mass and select files to avoid double counting:
     # - If *_combined.csv exists for a mass, use ONLY that file.
@@ -25,6 +25,7 @@ from __future__ import annotations
 import ast
 import sys
 from functools import lru_cache
+from itertools import chain
 from pathlib import Path
 from typing import Dict, Any
 
@@ -48,86 +49,89 @@ _ALLOWED_NUMPY_ATTRS = {
 }
 
 
+def _validate_safe_expr(node: ast.AST) -> None:
+    """
+    Single validation pass over a parsed expression, enforcing the same
+    whitelist the old AST-walking evaluator applied on every evaluation.
+    Raises ValueError on anything outside it.
+    """
+    if isinstance(node, ast.Constant):
+        if isinstance(node.value, (int, float, str)):
+            return
+        raise ValueError(f"Unsupported constant type: {type(node.value).__name__}")
+
+    if isinstance(node, ast.Name):
+        if node.id in ("hnl", "mass", "coupling", "np"):
+            return
+        raise ValueError(f"Name not allowed in expression: {node.id}")
+
+    if isinstance(node, ast.UnaryOp):
+        if not isinstance(node.op, (ast.UAdd, ast.USub)):
+            raise ValueError(f"Unary operator not allowed: {type(node.op).__name__}")
+        _validate_safe_expr(node.operand)
+        return
+
+    if isinstance(node, ast.BinOp):
+        if not isinstance(node.op, (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow)):
+            raise ValueError(f"Binary operator not allowed: {type(node.op).__name__}")
+        _validate_safe_expr(node.left)
+        _validate_safe_expr(node.right)
+        return
+
+    if isinstance(node, ast.Attribute):
+        if not isinstance(node.value, ast.Name):
+            raise ValueError("Only simple attribute access is allowed (e.g. hnl.foo, np.sqrt)")
+        base = node.value.id
+        attr = node.attr
+        if attr.startswith("_"):
+            raise ValueError("Access to private/dunder attributes is not allowed")
+        if base == "hnl":
+            if attr not in _ALLOWED_HNLCALC_EXPR_CALLS:
+                raise ValueError(f"hnl.{attr} is not allowed in expressions")
+            return
+        if base == "np":
+            if attr not in _ALLOWED_NUMPY_ATTRS:
+                raise ValueError(f"np.{attr} is not allowed in expressions")
+            return
+        raise ValueError(f"Attribute access not allowed on base: {base}")
+
+    if isinstance(node, ast.Call):
+        if node.keywords:
+            raise ValueError("Keyword arguments are not allowed in expressions")
+        _validate_safe_expr(node.func)
+        for arg in node.args:
+            _validate_safe_expr(arg)
+        return
+
+    raise ValueError(f"Expression node not allowed: {type(node).__name__}")
+
+
 @lru_cache(maxsize=4096)
-def _parse_safe_expr(expr: str) -> ast.AST:
-    return ast.parse(expr, mode="eval").body
+def _compile_safe_expr(expr: str):
+    """Validate an HNLCalc BR expression once and compile it to bytecode."""
+    tree = ast.parse(expr, mode="eval")
+    _validate_safe_expr(tree.body)
+    return compile(tree, "<hnlcalc-expr>", "eval")
 
 
 class _SafeExprEvaluator:
+    """
+    Evaluates whitelisted HNLCalc BR expressions. Validation happens once per
+    distinct expression (cached compile); evaluation runs the resulting
+    bytecode against an empty-builtins namespace exposing only hnl/mass/
+    coupling/np, so the per-call cost is a dict lookup plus the arithmetic.
+    """
+
     def __init__(self, *, hnl: Any, mass: float, coupling: float, np_module: Any) -> None:
-        self._hnl = hnl
-        self._mass = float(mass)
-        self._coupling = float(coupling)
-        self._np = np_module
+        self._namespace = {
+            "hnl": hnl,
+            "mass": float(mass),
+            "coupling": float(coupling),
+            "np": np_module,
+        }
 
     def eval(self, expr: str):
-        return self._eval_node(_parse_safe_expr(expr))
-
-    def _eval_node(self, node: ast.AST):
-        if isinstance(node, ast.Constant):
-            if isinstance(node.value, (int, float, str)):
-                return node.value
-            raise ValueError(f"Unsupported constant type: {type(node.value).__name__}")
-
-        if isinstance(node, ast.Name):
-            if node.id == "hnl":
-                return self._hnl
-            if node.id == "mass":
-                return self._mass
-            if node.id == "coupling":
-                return self._coupling
-            if node.id == "np":
-                return self._np
-            raise ValueError(f"Name not allowed in expression: {node.id}")
-
-        if isinstance(node, ast.UnaryOp):
-            operand = self._eval_node(node.operand)
-            if isinstance(node.op, ast.UAdd):
-                return +operand
-            if isinstance(node.op, ast.USub):
-                return -operand
-            raise ValueError(f"Unary operator not allowed: {type(node.op).__name__}")
-
-        if isinstance(node, ast.BinOp):
-            left = self._eval_node(node.left)
-            right = self._eval_node(node.right)
-            if isinstance(node.op, ast.Add):
-                return left + right
-            if isinstance(node.op, ast.Sub):
-                return left - right
-            if isinstance(node.op, ast.Mult):
-                return left * right
-            if isinstance(node.op, ast.Div):
-                return left / right
-            if isinstance(node.op, ast.Pow):
-                return left**right
-            raise ValueError(f"Binary operator not allowed: {type(node.op).__name__}")
-
-        if isinstance(node, ast.Attribute):
-            if not isinstance(node.value, ast.Name):
-                raise ValueError("Only simple attribute access is allowed (e.g. hnl.foo, np.sqrt)")
-            base = node.value.id
-            attr = node.attr
-            if attr.startswith("_"):
-                raise ValueError("Access to private/dunder attributes is not allowed")
-            if base == "hnl":
-                if attr not in _ALLOWED_HNLCALC_EXPR_CALLS:
-                    raise ValueError(f"hnl.{attr} is not allowed in expressions")
-                return getattr(self._hnl, attr)
-            if base == "np":
-                if attr not in _ALLOWED_NUMPY_ATTRS:
-                    raise ValueError(f"np.{attr} is not allowed in expressions")
-                return getattr(self._np, attr)
-            raise ValueError(f"Attribute access not allowed on base: {base}")
-
-        if isinstance(node, ast.Call):
-            if node.keywords:
-                raise ValueError("Keyword arguments are not allowed in expressions")
-            func = self._eval_node(node.func)
-            args = [self._eval_node(a) for a in node.args]
-            return func(*args)
-
-        raise ValueError(f"Expression node not allowed: {type(node).__name__}")
+        return eval(_compile_safe_expr(expr), {"__builtins__": {}}, self._namespace)
 
 
 # ----------------------------------------------------------------------
@@ -201,9 +205,18 @@ class HNLModel:
         self.Utau2 = float(Utau2)
         self.extra_args = extra_args
 
+        # Total mixing and the coupling epsilon = sqrt(sum |U|^2), used by
+        # both the HNLCalc construction and production_brs.
+        self._U_total = self.Ue2 + self.Umu2 + self.Utau2
+        self._coupling = self._U_total ** 0.5
+
         # Underlying HNLCalc object
         self._hnlcalc = self._build_hnlcalc()
 
+        # Flattened production-channel lists, filled lazily; the channel
+        # tables are static for a given HNLCalc instance.
+        self._production_channels_cache: tuple[list, list] | None = None
+
     # ------------------------------------------------------------------
     # 2.1. Construct the underlying HNLCalc object
     # ------------------------------------------------------------------
@@ -232,8 +245,8 @@ class HNLModel:
 
         # Generate decay widths and ctau for this mass
         # The coupling parameter here is epsilon = sqrt(Ue2 + Umu2 + Utau2)
-        # ctau scales as 1/epsilon^2, so we pass sqrt(Ue2 + Umu2 + Utau2)
-        epsilon = np.sqrt(self.Ue2 + self.Umu2 + self.Utau2)
+        # ctau scales as 1/epsilon^2
+        epsilon = self._coupling
 
         # Generate ctau and BRs for this mass point
         # Pass coupling so ctau is computed for the actual |U|² values
@@ -258,6 +271,23 @@ class HNLModel:
         # We passed a single mass point, so index [0]
         return self._hnlcalc.ctau[0]
 
+    def _production_channels(self) -> "tuple[list, list]":
+        """
+        Return the flattened (2-body, 3-body) production channel lists.
+
+        Flattening with itertools.chain is linear in the number of channels
+        (the old ``sum(..., [])`` idiom rebuilt the list per mode), and the
+        result is cached on the instance since the channel tables are static
+        for a given HNLCalc object.
+        """
+        if self._production_channels_cache is None:
+            hnl = self._hnlcalc
+            self._production_channels_cache = (
+                list(chain.from_iterable(hnl.get_channels_2body()["mode"].values())),
+                list(chain.from_iterable(hnl.get_channels_3body()["mode"].values())),
+            )
+        return self._production_channels_cache
+
     # ------------------------------------------------------------------
     # 2.3. Production BRs B(P -> N + X) per parent
     # ------------------------------------------------------------------
@@ -284,12 +314,11 @@ class HNLModel:
         import numpy as np
 
         # Get all 2-body and 3-body production channels from HNLCalc (mesons only)
-        channels_2body = sum(self._hnlcalc.get_channels_2body()["mode"].values(), [])
-        channels_3body = sum(self._hnlcalc.get_channels_3body()["mode"].values(), [])
+        channels_2body, channels_3body = self._production_channels()
 
         # Variables needed for controlled eval() calls
         mass = self.mass_GeV
-        coupling = np.sqrt(self.Ue2 + self.Umu2 + self.Utau2)
+        coupling = self._coupling
         hnl = self._hnlcalc  # BR strings reference "hnl" object
 
         evaluator = _SafeExprEvaluator(hnl=hnl, mass=mass, coupling=coupling, np_module=np)
@@ -300,6 +329,14 @@ class HNLModel:
         # Dictionary to accumulate BRs per parent
         br_per_parent = {}
 
+        # PID -> mass table built once: the same handful of parents and
+        # daughters recur across dozens of channels, and each hnl.masses
+        # call costs a str() construction plus an HNLCalc lookup.
+        pids = {int(c['pid0']) for c in channels_2body} | \
+               {int(c['pid1']) for c in channels_2body} | \
+               {int(c[k]) for c in channels_3body for k in ('pid0', 'pid1', 'pid2')}
+        mass_of = {pid: hnl.masses(str(pid)) for pid in pids}
+
         # Process 2-body channels
         for channel in channels_2body:
             pid0 = int(channel['pid0'])  # Parent PDG
@@ -307,8 +344,8 @@ class HNLModel:
             br_string = channel['br']    # String like "hnl.get_2body_br(411, -11)"
 
             # Check kinematic threshold
-            m_parent = hnl.masses(str(pid0))
-            m_daughter = hnl.masses(str(pid1))
+            m_parent = mass_of[pid0]
+            m_daughter = mass_of[pid1]
 
             if mass < m_parent - m_daughter:
                 # Evaluate the BR string safely; it returns another string with "mass" and "coupling" variables
@@ -329,9 +366,9 @@ class HNLModel:
             integration = channel['integration']
 
             # Get masses
-            m0 = hnl.masses(str(pid0))
-            m1 = hnl.masses(str(pid1))
-            m2 = hnl.masses(str(pid2))
+            m0 = mass_of[pid0]
+            m1 = mass_of[pid1]
+            m2 = mass_of[pid2]
 
             # Check kinematic threshold
             if mass < m0 - m1 - m2:
@@ -375,37 +412,30 @@ class HNLModel:
         m_W = 80.4  # GeV (PDG)
         m_Z = 91.2  # GeV (PDG)
 
+        # SM branching ratios (PDG 2024): W → ℓν for one lepton flavor, and
+        # Z → invisible (0.201) divided by 3 neutrino flavors.
+        BR_W_to_lnu_SM = 0.1086
+        BR_Z_to_nunu_SM = 0.201 / 3.0
+
         # W± → ℓ± N (kinematically allowed if m_N < m_W)
         if mass < m_W:
-            # SM branching ratio W → ℓν (one lepton flavor, PDG 2024)
-            BR_W_to_lnu_SM = 0.1086
-
-            # Kinematic factors
-            r_W = mass / m_W
-            phase_space_W = (1.0 - r_W**2)**2
-            helicity_W = (1.0 + r_W**2)
-
-            # Total BR: |U|² × BR_SM × kinematics
-            br_W = (self.Ue2 + self.Umu2 + self.Utau2) * BR_W_to_lnu_SM * phase_space_W * helicity_W
-            br_per_parent[24] = br_W
+            br_per_parent[24] = self._vector_boson_br(mass, m_W, BR_W_to_lnu_SM)
 
         # Z → ν N (kinematically allowed if m_N < m_Z)
         if mass < m_Z:
-            # SM branching ratio Z → νν (total over 3 flavors, PDG 2024)
-            # BR(Z → invisible) = 0.201, divided by 3 neutrino flavors
-            BR_Z_to_nunu_SM = 0.201 / 3.0
-
-            # Kinematic factors
-            r_Z = mass / m_Z
-            phase_space_Z = (1.0 - r_Z**2)**2
-            helicity_Z = (1.0 + r_Z**2)
-
-            # Total BR: |U|² × BR_SM × kinematics
-            br_Z = (self.Ue2 + self.Umu2 + self.Utau2) * BR_Z_to_nunu_SM * phase_space_Z * helicity_Z
-            br_per_parent[23] = br_Z
+            br_per_parent[23] = self._vector_boson_br(mass, m_Z, BR_Z_to_nunu_SM)
 
         return br_per_parent
 
+    def _vector_boson_br(self, mass: float, m_V: float, br_SM: float) -> float:
+        """
+        BR(V → ℓ/ν + N) for an electroweak boson V, per arXiv:1805.08567
+        Eq. 2.11-2.12: |U|² × BR_SM × (1 - r²)² × (1 + r²) with r = m_N/m_V
+        (phase-space suppression times the V-A helicity factor).
+        """
+        r2 = (mass / m_V) ** 2
+        return self._U_total * br_SM * (1.0 - r2) ** 2 * (1.0 + r2)
+
     # ------------------------------------------------------------------
     # 2.4. Convenience representation
     # ------------------------------------------------------------------